@@ -0,0 +1,136 @@
+"""Module with audio player: music and sound effects are loaded and played on a background thread."""
+import os
+import queue
+import threading
+import pygame
+
+POLL_TIME = 0.25  # seconds between checks, whether music queue must be filled again
+EFFECTS_CHANNEL = 0  # channel reserved for sound effects
+
+
+class AudioPlayer:
+    """
+    Player of music tracks and sound effects. Methods only put commands in a queue, all loading from disk
+    and calls of pygame.mixer are done on the player thread, so game loop never waits for audio.
+    Music is streamed by pygame.mixer.music; when it ends, the thread queues next tracks itself.
+    Sound effects are decoded to pygame.mixer.Sound beforehand and played on their own channel,
+    music is stopped while effect sounds (and started again after it).
+    Missing files are skipped.
+    """
+
+    def __init__(self, folder, next_track, effects=()):
+        self.folder = folder
+        self.next_track = next_track  # function, that returns name of next music track
+        self.effect_names = tuple(effects)
+        self.tracks_in_queue = 4  # tracks queued at once
+        self.missing = set()  # names of files, that can not be loaded
+        self.__sounds = {}  # name of effect: pygame.mixer.Sound
+        self.__commands = queue.Queue()
+        self.__music_on = False  # music is asked for (it is started again, when it is over)
+        self.__paused = False
+        self.__thread = None
+
+    def __start(self):
+        """Method start player thread on first command (effects are decoded first)."""
+        if self.__thread is None and pygame.mixer.get_init():
+            pygame.mixer.set_reserved(EFFECTS_CHANNEL + 1)
+            self.__thread = threading.Thread(target=self.__run, daemon=True)
+            self.__thread.start()
+            self.__commands.put((self.__preload, ()))
+
+    def __put(self, function, *args):
+        """Method put command in player queue."""
+        self.__start()
+        if self.__thread is not None:
+            self.__commands.put((function, args))
+
+    def play_music(self):
+        """Method start music from new random tracks."""
+        self.__put(self.__play_music)
+
+    def play_effect(self, name):
+        """Method play sound effect (par: name), music goes on after it."""
+        self.__put(self.__play_effect, name)
+
+    def pause_music(self):
+        """Method pause music."""
+        self.__put(self.__set_paused, True)
+
+    def unpause_music(self):
+        """Method continue paused music."""
+        self.__put(self.__set_paused, False)
+
+    def __path(self, name):
+        return os.path.join(self.folder, f'{name}.wav')
+
+    def __run(self):
+        """Method of player thread: it do commands and keeps music playing."""
+        while True:
+            try:
+                function, args = self.__commands.get(timeout=POLL_TIME)
+            except queue.Empty:
+                function, args = self.__keep_music, ()
+            try:
+                function(*args)
+            except pygame.error:
+                pass  # mixer is closed (game is being closed)
+
+    def __preload(self):
+        """Method decode sound effects."""
+        for name in self.effect_names:
+            if name not in self.__sounds and name not in self.missing:
+                try:
+                    self.__sounds[name] = pygame.mixer.Sound(self.__path(name))
+                except (pygame.error, OSError):
+                    self.missing.add(name)
+
+    def __queue_tracks(self):
+        """Method load next tracks to music stream and start it. Returns False, if there is no track to play."""
+        tracks = []
+        for _ in range(self.tracks_in_queue * 2):  # names of missing tracks are skipped
+            name = self.next_track()
+            if name not in self.missing and os.path.exists(self.__path(name)):
+                tracks.append(name)
+                if len(tracks) == self.tracks_in_queue:
+                    break
+            else:
+                self.missing.add(name)
+        if not tracks:
+            return False
+        pygame.mixer.music.load(self.__path(tracks[0]))
+        for name in tracks[1:]:
+            pygame.mixer.music.queue(self.__path(name))
+        pygame.mixer.music.play(-1)
+        return True
+
+    def __play_music(self):
+        self.__music_on = self.__queue_tracks()
+        if self.__paused:
+            pygame.mixer.music.pause()
+
+    def __keep_music(self):
+        """Method start music again, if it is over (or effect is over) and it is not paused."""
+        if self.__paused or pygame.mixer.music.get_busy() or pygame.mixer.Channel(EFFECTS_CHANNEL).get_busy():
+            return
+        if self.__music_on:
+            self.__music_on = self.__queue_tracks()
+
+    def __play_effect(self, name):
+        self.__preload()
+        sound = self.__sounds.get(name)
+        if sound is None:
+            return
+        pygame.mixer.music.stop()
+        channel = pygame.mixer.Channel(EFFECTS_CHANNEL)
+        channel.set_volume(pygame.mixer.music.get_volume())  # effects are as loud as music
+        channel.play(sound)
+        self.__music_on = True
+
+    def __set_paused(self, paused):
+        self.__paused = paused
+        if paused:
+            pygame.mixer.music.pause()
+            pygame.mixer.Channel(EFFECTS_CHANNEL).pause()
+        else:
+            pygame.mixer.music.unpause()
+            pygame.mixer.Channel(EFFECTS_CHANNEL).unpause()
@@ -0,0 +1 @@
+"""Performance reports and benchmarks of the game (run them from the project folder)."""
@@ -0,0 +1,98 @@
+"""
+Accuracy versus speed report of Barnes-Hut gravity solver.
+Usage: python -m benchmarks.gravity_report [--sizes 100 1000 5000] [--thetas 0.3 0.5 0.8 1.0]
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import service  # noqa: E402
+import gravity  # noqa: E402
+from planets import SpaceObject  # noqa: E402
+
+SPRITE_REFERENCE_LIMIT = 500  # above it the reference is gravity.pairwise_forces (same law, checked below)
+
+
+def random_scene(n, seed=0):
+    """Function create n objects with game-like coordinates and masses."""
+    rng = random.Random(seed)
+    positions = [(rng.randint(0, service.WIN_WIDTH), rng.randint(0, service.WIN_HEIGHT)) for _ in range(n)]
+    masses = [rng.choice((10, 10, 10, 30, -10, 1)) for _ in range(n)]
+    return np.array(positions, dtype=np.float64), np.array(masses, dtype=np.float64)
+
+
+def sprite_forces(positions, masses):
+    """Function calculate forces with SpaceObject.gravitational_force for every pair."""
+    objects = []
+    for (x, y), mass in zip(positions, masses):
+        obj = SpaceObject(0, 0, mass, service.prop_img)
+        obj.rect = obj.image.get_rect(topleft=(x, y))
+        objects.append(obj)
+    for obj in objects:
+        obj.reset_forses()
+    for obj_i, obj_j in itertools.combinations(objects, 2):
+        obj_i.gravitational_force(obj_j)
+    return np.array([(obj.fx, obj.fy) for obj in objects])
+
+
+def timed(func, *args, repeat=3):
+    """Function returns (best time in seconds, result) of given call."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def relative_errors(approx, exact):
+    """Function returns error of every force relative to its exact magnitude."""
+    magnitude = np.linalg.norm(exact, axis=1)
+    return np.linalg.norm(approx - exact, axis=1) / np.maximum(magnitude, 1e-12)
+
+
+def report(sizes, thetas):
+    """Function print accuracy and speed of Barnes-Hut for every size and opening angle."""
+    print(f"{'bodies':>7} {'solver':>12} {'theta':>6} {'time, ms':>10} {'speedup':>8} "
+          f"{'median err':>11} {'p99 err':>9} {'max err':>9}")
+    for n in sizes:
+        positions, masses = random_scene(n)
+        exact_time, exact = timed(gravity.pairwise_forces, positions, masses)
+        if n <= SPRITE_REFERENCE_LIMIT:
+            sprite_time, reference = timed(sprite_forces, positions, masses, repeat=1)
+            errors = relative_errors(exact, reference)
+            print(f"{n:>7} {'sprites':>12} {'-':>6} {sprite_time * 1000:>10.2f} {'1.00':>8} "
+                  f"{0:>11.2e} {0:>9.2e} {0:>9.2e}")
+        else:
+            sprite_time, reference = None, exact
+            errors = np.zeros(n)
+        speedup = f"{sprite_time / exact_time:.2f}" if sprite_time else '-'
+        print(f"{n:>7} {'exact':>12} {'-':>6} {exact_time * 1000:>10.2f} {speedup:>8} "
+              f"{np.median(errors):>11.2e} {np.percentile(errors, 99):>9.2e} {errors.max():>9.2e}")
+        for theta in thetas:
+            bh_time, approx = timed(gravity.barnes_hut_forces, positions, masses, theta)
+            errors = relative_errors(approx, reference)
+            print(f"{n:>7} {'barnes_hut':>12} {theta:>6.2f} {bh_time * 1000:>10.2f} "
+                  f"{exact_time / bh_time:>8.2f} {np.median(errors):>11.2e} "
+                  f"{np.percentile(errors, 99):>9.2e} {errors.max():>9.2e}")
+    print("speedup of barnes_hut is measured against exact; errors are relative to the sprite "
+          f"reference for up to {SPRITE_REFERENCE_LIMIT} bodies.")
+
+
+def main():
+    """Report script."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000, 5000])
+    parser.add_argument('--thetas', type=float, nargs='+', default=[0.3, 0.5, 0.8, 1.0])
+    args = parser.parse_args()
+    report(args.sizes, args.thetas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Headless benchmarks of simulation hot paths at growing numbers of asteroids.
+Usage: python -m benchmarks.hot_paths [--counts 10 100 1000 10000] [--only trajectory is_collide]
+                                    [--save] [--threshold 0.25] [--baseline benchmarks/baseline.json]
+Times are compared with baseline file (written by --save); exit code is 1 if a benchmark got slower
+than baseline by more than threshold.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import buttons  # noqa: E402
+import level  # noqa: E402
+import planets  # noqa: E402
+import render  # noqa: E402
+import service  # noqa: E402
+from buttons import place_counters  # noqa: E402
+from constants import FPS  # noqa: E402
+
+COUNTS = (10, 100, 1000, 10000)
+BASELINE_FILE = os.path.join(service.game_folder, 'benchmarks', 'baseline.json')
+THRESHOLD = 0.25  # allowed slowdown against baseline (0.25 is 25 %)
+MIN_TIME = 0.3  # seconds every benchmark is repeated for (at least one call is done)
+SCENE = 'lvl_3'  # level, whose planets are used
+FRAMES = 10  # frames of Level.run measured at once
+MAX_CALL = 5  # seconds; bigger counts are skipped, if one call is expected to be longer (growth is taken as n^2)
+
+
+class _Done(Exception):
+    """Exception, that stops Level.run after given number of frames."""
+
+
+class _FrameClock:
+    """Clock for Level.run: every frame lasts exactly 1 / FPS, after given number of frames run is stopped."""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def tick(self, fps=0):
+        if self.frames == 0:
+            raise _Done
+        self.frames -= 1
+        return 1000 / FPS
+
+
+def _level(count, seed=0) -> level.Level:
+    """Function returns level SCENE with given number of asteroids, that do not touch planets."""
+    record = level.levels.records[SCENE]
+    rng = random.Random(seed)
+    random.seed(seed)  # colors of asteroids
+    scene = level.Level.from_record(record._replace(asteroids=()))
+    scene.get_settings()
+    planet_rects = [planet.rect.inflate(40, 40) for planet in service.all_planet]
+    asteroids = []
+    while len(asteroids) < count:
+        x, y = rng.randrange(50, service.WIN_WIDTH - 50), rng.randrange(50, service.WIN_HEIGHT - 50)
+        if service.pygame.Rect(x - 18, y - 18, 36, 36).collidelist(planet_rects) == -1:
+            asteroids.append(((x, y), (x + rng.uniform(-10, 10), y + rng.uniform(-10, 10))))
+    return level.Level.from_record(record._replace(asteroids=tuple(asteroids)))
+
+
+def _scene(count):
+    """Function set level with given number of asteroids as current one."""
+    _level(count).get_settings()
+    for asteroid in service.available_asteroids:  # as after first physics step
+        service.collision_grid.update(asteroid)
+
+
+def bench_move_with_gravity(count):
+    """Forces between all asteroids (planets are in static field)."""
+    _scene(count)
+    return lambda: planets.move_with_gravity(service.available_asteroids)
+
+
+def bench_trajectory(count):
+    """Uncached trajectory preview (AsteroidTrajectory.to_draw_traectory) among given number of asteroids."""
+    _scene(count)
+    asteroid = next(iter(service.available_asteroids))
+    aim = (asteroid.rect.x + 30, asteroid.rect.y + 20)
+
+    def run():
+        trajectory = planets.trajectory_pool.acquire(asteroid, aim)
+        trajectory.to_draw_traectory()
+        planets.trajectory_pool.release(trajectory)  # its body is given back, so world does not grow
+    return run
+
+
+def bench_ask_satellites(count):
+    """Orbit classification of all asteroids around all planets."""
+    _scene(count)
+    return lambda: planets.ask_satellites(service.available_asteroids)
+
+
+def bench_is_collide(count):
+    """Planet-asteroid collision check (asteroids do not touch planets, so none is killed)."""
+    _scene(count)
+    return lambda: planets.is_collide(service.all_planet, service.available_asteroids)
+
+
+def bench_place_counters(count):
+    """Layout of counters of all planets (it does not depend on asteroids)."""
+    _scene(count)
+    return place_counters
+
+
+def bench_draw_frame(count):
+    """Full repaint of window by DirtyRenderer: planets, counters, asteroids and buttons (as after resize)."""
+    _scene(count)
+    renderer = render.DirtyRenderer()
+
+    def run():
+        renderer.invalidate()
+        renderer.draw_group(service.all_lives_sprites)
+        renderer.draw_group(service.all_planet)
+        planets.to_animate_objects(service.lvl_counters, renderer)
+        renderer.draw_group(service.available_asteroids)
+        planets.to_animate_objects(service.all_buttons, renderer)
+        renderer.present(service.pygame.display.get_surface(), buttons.background.image)
+    return run
+
+
+def bench_level_frames(count):
+    """FRAMES frames of Level.run."""
+    scene = _level(count)
+
+    def run():
+        level.clock = _FrameClock(FRAMES)
+        try:
+            scene.run()
+        except _Done:
+            pass
+    return run
+
+
+BENCHMARKS = {'move_with_gravity': bench_move_with_gravity, 'trajectory': bench_trajectory,
+              'ask_satellites': bench_ask_satellites, 'is_collide': bench_is_collide,
+              'place_counters': bench_place_counters, 'draw_frame': bench_draw_frame,
+              'level_frames': bench_level_frames}
+
+
+def measure(function, min_time=MIN_TIME) -> float:
+    """Function returns median time of one call of function (it is called for about min_time seconds)."""
+    function()  # warm up caches
+    times = []
+    started = time.perf_counter()
+    while not times or time.perf_counter() - started < min_time:
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def run_benchmarks(names, counts, min_time=MIN_TIME) -> dict:
+    """Function returns {benchmark: {count: seconds per call}} and prints scaling curves."""
+    service.music_on_pause = True  # music is not a part of measured time
+    service.idle_scheduler.enabled = False  # frames are not waited for
+    results = {}
+    for name in names:
+        results[name] = {}
+        print(f"{name}: {BENCHMARKS[name].__doc__}")
+        previous = None
+        for count in counts:
+            if previous is not None and previous[1] * (count / previous[0]) ** 2 > MAX_CALL:
+                print(f"  {count:>6} asteroids  skipped (one call is expected to be longer than {MAX_CALL} s)")
+                continue
+            seconds = measure(BENCHMARKS[name](count), min_time)
+            results[name][str(count)] = seconds
+            # exponent of growth: 1 is linear, 2 is quadratic
+            growth = ''
+            if previous is not None:
+                growth = f"  n^{math.log(seconds / previous[1]) / math.log(count / previous[0]):.2f}"
+            print(f"  {count:>6} asteroids  {seconds * 1000:10.3f} ms  "
+                  f"{seconds / count * 1e6:9.3f} us/asteroid{growth}")
+            previous = (count, seconds)
+    service.delete_all_sprites()
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD) -> list:
+    """Function returns descriptions of benchmarks, that are slower than baseline by more than threshold."""
+    regressions = []
+    for name, times in results.items():
+        for count, seconds in times.items():
+            old = baseline.get(name, {}).get(count)
+            if old and seconds > old * (1 + threshold):
+                regressions.append(f"{name} at {count} asteroids: {old * 1000:.3f} ms -> {seconds * 1000:.3f} ms "
+                                   f"({seconds / old - 1:+.0%})")
+    return regressions
+
+
+def main(args=None) -> int:
+    """Function run benchmarks by command line arguments and returns exit code."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=list(COUNTS), help='numbers of asteroids')
+    parser.add_argument('--only', nargs='+', default=list(BENCHMARKS), choices=BENCHMARKS, help='benchmarks to run')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline file')
+    parser.add_argument('--save', action='store_true', help='write results to baseline file')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed slowdown (0.25 is 25 %%)')
+    parser.add_argument('--min-time', type=float, default=MIN_TIME, help='seconds every benchmark is repeated for')
+    args = parser.parse_args(args)
+
+    results = run_benchmarks(args.only, args.counts, args.min_time)
+
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"baseline is written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save to write it")
+        return 0
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regressions (threshold {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Offline solver of levels: launch points and drag vectors are searched for shots, that make asteroid a satellite
+of a planet. Shots are simulated headlessly by game physics in a process pool (on all cores).
+Usage: python -m benchmarks.level_solver [lvl_1 lvl_3 ...] [--step 100] [--workers 4] [--heatmap heatmap_{}.png]
+Without level names every level of levels.json, where planets need satellites, is checked within its lives.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np  # noqa: E402
+import pygame  # noqa: E402
+import service  # noqa: E402
+import level  # noqa: E402
+import planets  # noqa: E402
+from constants import FPS  # noqa: E402
+
+GRID_STEP = 100  # pixels between launch points
+ANGLES = 16  # directions of drag
+DRAG_LENGTHS = (30, 60, 100, 150)  # pixels of drag (speed of asteroid is a half of it)
+MAX_STEPS = 10 * FPS  # physics steps shot is simulated for
+MARGIN = 50  # launch points are not closer to window edge
+SEED = 0  # random (asteroid images, so sizes of rects, that starting velocity depends on) is the same for every shot
+HEATMAP_LEVELS = ' .:-=+*#%@'
+
+Shot = namedtuple('Shot', ['x', 'y', 'dx', 'dy'])  # launch point and drag from it to point of mouse release
+Result = namedtuple('Result', ['shot', 'planet', 'steps'])  # planet: index of planet, that caught asteroid, or -1
+
+_scene = None  # level of worker process
+_max_steps = MAX_STEPS
+
+
+def set_level(name) -> level.Level:
+    """Function set level (par: name) as current one without sound and returns it."""
+    service.music_on_pause = True
+    service.on_lvl = name
+    scene = level.levels[name]
+    scene.get_settings()
+    return scene
+
+
+def reset_level(scene):
+    """Function remove launched asteroids and satellites of planets, asteroids of level are put back."""
+    service.seed_random(SEED)
+    for asteroid in service.available_asteroids.sprites():
+        asteroid.kill()
+    for planet in service.all_planet:
+        planet.satellites.empty()
+    for location, force_vector in zip(scene.asteroids, scene.force_vectors):
+        asteroid = planets.asteroid_pool.acquire(*location)
+        asteroid.starting_direction(force_vector)
+        service.all_objects.add(asteroid)
+        service.available_asteroids.add(asteroid)
+
+
+def launch(shot) -> planets.Asteroid:
+    """Function launch asteroid as Level.run do on mouse press and release."""
+    service.seed_random(SEED)
+    asteroid = planets.asteroid_pool.acquire(shot.x, shot.y)
+    asteroid.starting_direction((shot.x + shot.dx, shot.y + shot.dy))
+    service.all_objects.add(asteroid)
+    service.available_asteroids.add(asteroid)
+    return asteroid
+
+
+def fly(asteroid, max_steps=MAX_STEPS) -> tuple:
+    """
+    Function do physics steps of level (as Level.run do) until asteroid becomes a satellite or is lost.
+    Returns (index of planet, that caught asteroid, or -1, number of steps).
+    """
+    level_planets = list(service.all_planet)
+    for step in range(1, max_steps + 1):
+        planets.ask_satellites(service.available_asteroids)
+        for i, planet in enumerate(level_planets):
+            if asteroid in planet.satellites:
+                return i, step
+        planets.move_asteroids(service.all_objects, service.available_asteroids)
+        planets.is_collide(service.all_planet, service.available_asteroids)
+        if not asteroid.alive():
+            return -1, step
+    return -1, max_steps
+
+
+def _init_worker(name, max_steps):
+    """Function set level in worker process."""
+    global _scene, _max_steps
+    _scene = set_level(name)
+    _max_steps = max_steps
+
+
+def _evaluate(shot) -> Result:
+    """Function simulate one shot in worker process."""
+    reset_level(_scene)
+    return Result(shot, *fly(launch(shot), _max_steps))
+
+
+def candidate_shots(step=GRID_STEP, angles=ANGLES, lengths=DRAG_LENGTHS) -> list:
+    """Function returns shots from grid of launch points, that are not on planets, in every direction."""
+    blocked = [planet.rect.inflate(20, 20) for planet in service.all_planet]
+    directions = [(np.cos(2 * np.pi * i / angles), np.sin(2 * np.pi * i / angles)) for i in range(angles)]
+    shots = []
+    for y in range(MARGIN, service.WIN_HEIGHT - MARGIN + 1, step):
+        for x in range(MARGIN, service.WIN_WIDTH - MARGIN + 1, step):
+            if any(rect.collidepoint(x, y) for rect in blocked):
+                continue
+            shots.extend(Shot(x, y, round(cos * length), round(sin * length))
+                         for cos, sin in directions for length in lengths)
+    return shots
+
+
+def search(name, shots, workers=None, max_steps=MAX_STEPS) -> list:
+    """Function simulate shots in level (par: name) in process pool and returns their results."""
+    context = multiprocessing.get_context('spawn')  # workers set their own headless pygame
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(name, max_steps)) as pool:
+        return list(pool.map(_evaluate, shots, chunksize=max(1, len(shots) // (8 * (workers or os.cpu_count())))))
+
+
+def heatmap(results, step=GRID_STEP) -> np.ndarray:
+    """Function returns part of successful shots at every launch point (rows are y, columns are x)."""
+    rows = (service.WIN_HEIGHT - 2 * MARGIN) // step + 1
+    columns = (service.WIN_WIDTH - 2 * MARGIN) // step + 1
+    caught = np.zeros((rows, columns))
+    tried = np.zeros((rows, columns))
+    for result in results:
+        cell = ((result.shot.y - MARGIN) // step, (result.shot.x - MARGIN) // step)
+        tried[cell] += 1
+        caught[cell] += result.planet >= 0
+    with np.errstate(invalid='ignore'):
+        return np.where(tried > 0, caught / np.maximum(tried, 1), np.nan)
+
+
+def rank(results, step=GRID_STEP) -> list:
+    """
+    Function returns successful shots, the best go first: shots from launch points, where more directions succeed
+    (they are easier to repeat), then faster ones.
+    """
+    rates = heatmap(results, step)
+    caught = [result for result in results if result.planet >= 0]
+
+    def key(result):
+        return -rates[(result.shot.y - MARGIN) // step, (result.shot.x - MARGIN) // step], result.steps
+    return sorted(caught, key=key)
+
+
+def make_plan(ranked, conditions, skip=0) -> list:
+    """
+    Function choose best shots for every planet by its condition (number of satellites it needs);
+    skip first shots of every planet to get another plan. Shots from launch points, that are not used yet,
+    go first (asteroid launched near previous one is pulled off by it).
+    Returns list of shots or None, if there are not enough shots.
+    """
+    plan, points = [], set()
+    for index, needed in enumerate(conditions):
+        found = [result.shot for result in ranked if result.planet == index]
+        if needed and len(found) < needed + skip:
+            return None
+        for _ in range(needed):
+            found.sort(key=lambda shot: (shot.x, shot.y) in points)  # sort is stable, rank is kept
+            shot = found.pop(min(skip, len(found) - 1))
+            plan.append(shot)
+            points.add((shot.x, shot.y))
+    return plan
+
+
+def play_plan(scene, plan, max_steps=MAX_STEPS) -> tuple:
+    """
+    Function play shots one after another in current level: next shot is made when previous asteroid is caught.
+    Returns (whether all planets have enough satellites, seconds of game time).
+    """
+    reset_level(scene)
+    steps = 0
+    for shot in plan:
+        steps += fly(launch(shot), max_steps)[1]
+    planets.ask_satellites(service.available_asteroids)
+    return planets.lvl_completed(), steps / FPS
+
+
+def save_heatmap(path, rates, scene, step=GRID_STEP):
+    """Function save picture of level with launch points painted by part of successful shots."""
+    surface = pygame.Surface((service.WIN_WIDTH, service.WIN_HEIGHT))
+    surface.blit(service.set_background(scene.background), (0, 0))
+    for planet in service.all_planet:
+        planet.draw(surface)
+    overlay = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+    for (row, column), rate in np.ndenumerate(rates):
+        if not np.isnan(rate):
+            center = (MARGIN + column * step, MARGIN + row * step)
+            color = (int(255 * (1 - rate)), int(255 * rate), 0, 150)
+            pygame.draw.rect(overlay, color, pygame.Rect(0, 0, step - 4, step - 4).move(
+                center[0] - step // 2 + 2, center[1] - step // 2 + 2))
+    surface.blit(overlay, (0, 0))
+    pygame.image.save(surface, path)
+
+
+def solve(name, step=GRID_STEP, workers=None, max_steps=MAX_STEPS, heatmap_path=None, plans=5) -> dict:
+    """Function search shots for level (par: name), print ranked shots and heatmap and returns report."""
+    started = time.perf_counter()
+    scene = set_level(name)
+    conditions = [planet.condition for planet in service.all_planet]
+    shots = candidate_shots(step)
+    results = search(name, shots, workers, max_steps)
+    ranked = rank(results, step)
+    rates = heatmap(results, step)
+
+    print(f"{name}: {len(shots)} shots, {len(ranked)} caught, planets need {conditions}, lives {len(scene.lives)}")
+    for result in ranked[:5]:
+        print(f"  planet {result.planet}: launch at ({result.shot.x}, {result.shot.y}), "
+              f"drag ({result.shot.dx}, {result.shot.dy}), caught in {result.steps / FPS:.2f} s")
+    for row in rates:
+        print('  ' + ''.join(' ' if np.isnan(rate) else HEATMAP_LEVELS[int(rate * (len(HEATMAP_LEVELS) - 1))]
+                             for rate in row))
+    if heatmap_path:
+        save_heatmap(heatmap_path.format(name), rates, scene, step)
+
+    report = {'level': name, 'shots': len(shots), 'caught': len(ranked), 'solved': False, 'plan': None,
+              'game_seconds': None, 'within_lives': False}
+    for skip in range(plans):
+        plan = make_plan(ranked, conditions, skip)
+        if plan is None:
+            break
+        passed, seconds = play_plan(scene, plan, max_steps)
+        if passed:
+            report.update(solved=True, plan=plan, game_seconds=seconds, within_lives=len(plan) <= len(scene.lives))
+            break
+    report['wall_seconds'] = time.perf_counter() - started
+    if report['solved']:
+        print(f"  solved with {len(report['plan'])} shots in {report['game_seconds']:.1f} s of game "
+              f"({'within' if report['within_lives'] else 'NOT within'} {len(scene.lives)} lives)")
+        for shot in report['plan']:
+            print(f"    launch at ({shot.x}, {shot.y}), drag ({shot.dx}, {shot.dy})")
+    else:
+        print("  NOT solved")
+    print(f"  searched in {report['wall_seconds']:.1f} s")
+    return report
+
+
+def solvable_levels() -> list:
+    """Function returns names of levels, where asteroids can be launched and planets need satellites."""
+    names = []
+    for name in level.levels:
+        scene = level.levels[name]
+        if not scene.special_lvl and not scene.not_allowed_to_cr_aster and \
+                any(planet['condition'] for planet in scene.planets):
+            names.append(name)
+    return names
+
+
+def main():
+    """Solver script, exit code is 1 if some level is not solved within its lives."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('levels', nargs='*', help='names of levels (default: all, that need satellites)')
+    parser.add_argument('--step', type=int, default=GRID_STEP, help='pixels between launch points')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: number of cores)')
+    parser.add_argument('--max-steps', type=int, default=MAX_STEPS, help='physics steps of one shot')
+    parser.add_argument('--heatmap', default=None, help='picture file of heatmap, {} is replaced by level name')
+    args = parser.parse_args()
+    reports = [solve(name, args.step, args.workers, args.max_steps, args.heatmap)
+               for name in args.levels or solvable_levels()]
+    return 0 if all(report['within_lives'] for report in reports) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,61 @@
+"""
+Headless replay of recorded session (record it with ORBIT_RECORD=session.orbit python __init__.py).
+Frames are played at full speed, without display and sound; world state is checked against recorded digests.
+Usage: python -m benchmarks.replay session.orbit
+With ORBIT_PROFILE=1 ORBIT_TRACE=trace.csv time of every replayed frame is written to trace.csv.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import service  # noqa: E402
+import level  # noqa: E402
+import replay  # noqa: E402
+
+
+def play(path):
+    """Function play session file and returns Player."""
+    player = replay.Player(path)
+    replay.source = player
+    service.music_on_pause = True  # sound is not played
+    try:
+        while not service.game_done:
+            level.levels[service.on_lvl].run()
+    except (replay.ReplayFinished, SystemExit):  # SystemExit: window was closed in session
+        pass
+    service.profiler.save()
+    return player
+
+
+def main():
+    """
+    Replay script, exit code is 1 if world state differs from recorded one, no frame was played
+    or session file is broken (it is truncated or it does not fit levels).
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', help='session file')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    try:
+        player = play(args.path)
+    except ValueError as error:
+        print(error)
+        return 1
+    seconds = time.perf_counter() - start
+    print(f"{player.frames} frames in {seconds:.2f} s ({player.frames / max(seconds, 1e-9):.0f} frames/s), "
+          f"{player.checks} state checks compared, {len(player.mismatches)} mismatches")
+    if player.mismatches:
+        print(f"world state differs from recorded one first at frame {player.mismatches[0]}")
+    if player.truncated:
+        print(f"session file ends inside a record after frame {player.frames}")
+    if not player.frames:
+        print("no frame was played")
+    return 1 if player.mismatches or player.truncated or not player.frames else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
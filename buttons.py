@@ -1,6 +1,12 @@
 """Module with game buttons and messages."""
+import time
 import pygame.sprite
 import service
+import spatial
+
+RESIZE_DELAY = 0.2  # seconds without window resize, after which background is scaled in good quality
+SHEAR = (0, 50, -50, 100, -100, 150, -150, 200, -200, 250, -250)  # shifts of counter from its planet, best first
+COUNTER_SPACE = (50, 50)  # size of free space, that counter needs
 
 
 class Button(pygame.sprite.Sprite):
@@ -10,8 +16,7 @@ class Button(pygame.sprite.Sprite):
 
     def __init__(self, x, y, image):
         super().__init__()
-        self.image = image
-        self.image.set_colorkey(service.colors["BLACK"])
+        self.image = image  # images are shared, they are prepared by service (see service.assets)
         self.rect = self.image.get_rect()
         self.rect.center = (float(x), float(y))
         self.is_last = False
@@ -23,9 +28,14 @@ class Button(pygame.sprite.Sprite):
         """
         return self.rect.collidepoint(pos)
 
-    def draw(self):
-        """Method draw objects."""
-        service.screen.blit(self.image, (self.rect.x, self.rect.y))
+    def animate(self):
+        """Method change object before it is drawn, returns whether object is visible."""
+        return True
+
+    def draw(self, surface=None):
+        """Method draw objects (on service.screen by default)."""
+        if self.animate():
+            (service.screen if surface is None else surface).blit(self.image, (self.rect.x, self.rect.y))
 
     def to_act(self, pos):
         """
@@ -47,10 +57,6 @@ class StartingGameButton(Button):
         service.on_lvl = 'lvl_1'
         return True
 
-    def draw(self):
-        """Method draw objects."""
-        service.screen.blit(self.image, (self.rect.x, self.rect.y))
-
 
 class BackToMenuButton(Button):
     """Button that return game to main menu."""
@@ -99,12 +105,13 @@ class HelpButton(Button):
         Method add help message to lvl environment and set game setting the way
         almost all game process pause and help message appears.
         """
-        for button in (help_message, next_page_button, previous_page_button):
+        help_buttons = [get_button(name) for name in ('help_message', 'next_page_button', 'previous_page_button')]
+        for button in help_buttons:
             button.normalize_loc()
-        service.all_buttons.add(help_message, next_page_button, previous_page_button)
+        service.all_buttons.add(*help_buttons)
         service.on_pause = True
         if not service.music_on_pause:
-            sound_button.to_act()
+            get_button('sound_button').to_act()
         return True
 
 
@@ -121,11 +128,11 @@ class SoundButton(Button):
         if not service.music_on_pause:
             change_img(self, service.sound_on_button_img)
             service.music_on_pause = True
-            pygame.mixer.music.pause()
+            service.audio_player.pause_music()
         else:
             change_img(self, service.sound_off_button_img)
             service.music_on_pause = False
-            pygame.mixer.music.unpause()
+            service.audio_player.unpause_music()
         return False
 
 
@@ -134,18 +141,32 @@ class Background(pygame.sprite.Sprite):
 
     def __init__(self, image):
         pygame.sprite.Sprite.__init__(self)
+        self.__resized_at = None
         self.image = image
-        self.rect = self.image.get_rect()
-        self.rect.left, self.rect.top = [0, 0]
+        self.rect = pygame.Rect(0, 0, service.WIN_WIDTH, service.WIN_HEIGHT)
 
     @property
     def image(self):
-        """Returns background image."""
+        """Returns background image (it is loaded on first use)."""
+        if self.__image is None or (self.__resized_at is not None and
+                                    time.perf_counter() - self.__resized_at > RESIZE_DELAY):
+            self.__resized_at = None
+            self.__image = service.set_background(self.__image_name)
         return self.__image
 
     @image.setter
     def image(self, image):
-        self.__image = service.set_background(image)
+        self.__image_name = image
+        self.__resized_at = None
+        self.__image = None
+
+    def resize(self):
+        """
+        Method fit image to new window size. Until window stops changing, image is
+        only stretched (it is fast), then it is taken from service.background_cache.
+        """
+        self.__resized_at = time.perf_counter()
+        self.__image = pygame.transform.scale(self.image, (service.WIN_WIDTH, service.WIN_HEIGHT))
 
 
 class Life(Button):
@@ -172,10 +193,11 @@ class Pointer(Button):
         self.rect.y += self.step
         self.shifted += self.step
 
-    def draw(self):
-        """Method shake and draw object."""
-        self.shake()
-        service.screen.blit(self.image, (self.rect.x, self.rect.y))
+    def animate(self):
+        """Method shake object before it is drawn (it stops, when there is no input, see IdleScheduler.quiet)."""
+        if not service.idle_scheduler.quiet:
+            self.shake()
+        return True
 
 
 class HelpMessage(Button):
@@ -204,15 +226,16 @@ class HelpMessage(Button):
     def to_act(self, pos):
         """Method that close message and set game setting to
         continue game."""
+        next_page_button, previous_page_button = get_button('next_page_button'), get_button('previous_page_button')
         if next_page_button.is_pressed(pos) or previous_page_button.is_pressed(pos):
             pass
         else:
-            if pointer_message in service.all_buttons:
-                pointer_message.kill()
+            if is_shown('pointer_message'):
+                get_button('pointer_message').kill()
             service.all_buttons.remove(next_page_button, previous_page_button)
             service.on_pause = False
             service.all_buttons.remove(self)
-            sound_button.to_act()
+            get_button('sound_button').to_act()
             return False  # it normalize still_on_lvl to True
 
     def normalize_loc(self):
@@ -276,54 +299,91 @@ class SatellitesCounter(Button):
     """Visible game object, that show how many satellites left to set to given planet. """
 
     def __init__(self, planet):
-        shift = free_space_near(*planet.rect.center, 50, 50)
-        super().__init__(planet.rect.x + shift[0], planet.rect.y + shift[1], service.levels_img[0])
+        super().__init__(planet.rect.x, planet.rect.y - 50, service.levels_img[0])  # it is placed by place_counters()
         self.__planet_connceted_with = planet
 
-    def draw(self):
-        """Method draw objects."""
+    def place(self, grid):
+        """Method move counter to free space near its planet (par: grid, see occupancy_grid()) and occupy it."""
+        planet = self.__planet_connceted_with
+        shift = free_space_near(*planet.rect.topleft, *COUNTER_SPACE, grid)
+        self.rect.center = (planet.rect.x + shift[0], planet.rect.y + shift[1])
+        grid.occupy(self.rect)  # it is the rect, that was found free (counter image has size of COUNTER_SPACE)
+
+    def animate(self):
+        """Method show number of satellites left, counter is hidden when there are none."""
         if self.__planet_connceted_with.condition == 0:
-            pass
-        else:
-            change_img(self, service.levels_img[self.__planet_connceted_with.condition - 1])
-            service.screen.blit(self.image, (self.rect.x, self.rect.y))
+            return False
+        change_img(self, service.levels_img[self.__planet_connceted_with.condition - 1])
+        return True
 
 
 def change_img(obj: pygame.sprite.Sprite, img):
-    """Function change image of object."""
+    """Function change image of object (image is shared, it is not changed)."""
     obj.image = img
-    obj.image.set_colorkey(service.colors["BLACK"])
 
 
-def free_space_near(x, y, wight, hight):
+def occupancy_grid() -> spatial.OccupancyGrid:
+    """Function returns occupancy grid of window with buttons, planets and lives of level."""
+    grid = spatial.OccupancyGrid((service.WIN_WIDTH, service.WIN_HEIGHT))
+    for group in (service.all_buttons, service.all_planet, service.all_lives_sprites):
+        for sprite in group:
+            grid.occupy(sprite.rect)
+    return grid
+
+
+def free_space_near(x, y, wight, hight, grid=None):
     """
     Fuction find free space(where rect with given wight, hight do not collide with other obj)
-    near point(par: x, y). It returns coordinates of rect.center
+    near point(par: x, y). It returns shift of rect.center from the point.
+    Occupied space is taken from grid (par: grid, default: occupancy_grid()).
     """
-    shear = [0, 50, -50, 100, -100, 150, -150, 200, -200, 250, -250]
-    shifts = ((i, j) for i in shear for j in shear)
-    res = (0, -50)
-    for shift in shifts:
-        rect_ = pygame.sprite.Sprite()
-        rect_.rect = pygame.Rect(x + shift[0], y + shift[1], wight, hight)
-        if not (pygame.sprite.spritecollide(rect_, service.all_buttons, dokill=False) or
-                pygame.sprite.spritecollide(rect_, service.all_planet, dokill=False) or
-                pygame.sprite.spritecollide(rect_, service.all_lives_sprites, dokill=False)):
-            res = shift
-            break
-    return res
-
-
-# initialize almost all possible buttons
-background = Background("loading_image")
-next_lvl_button = NextLevelButton(service.WIN_WIDTH - 50, 50)
-starting_game_button = StartingGameButton(service.WIN_WIDTH // 2, service.WIN_HEIGHT // 1.2)
-back_to_menu_button = BackToMenuButton(50, 50)
-back_to_checkpoint_button = BackToCheckpointButton(service.WIN_WIDTH // 2, service.WIN_HEIGHT // 1.2)
-help_button = HelpButton(service.WIN_WIDTH - 130, 50)
-sound_button = SoundButton(service.WIN_WIDTH - 260, 50)
-help_message = HelpMessage(service.WIN_WIDTH // 2, service.WIN_HEIGHT // 2)
-pointer_message = Pointer(service.WIN_WIDTH - 110, 230)
-checkpoint_sign = CheckpointSign(service.WIN_WIDTH - 200, 40)
-next_page_button = NextPageButton(help_message)
-previous_page_button = PreviousPageButton(help_message)
+    if grid is None:
+        grid = occupancy_grid()
+    for i in SHEAR:
+        for j in SHEAR:
+            if grid.is_free((x + i - wight // 2, y + j - hight // 2, wight, hight)):
+                return i, j
+    return 0, -50
+
+
+def place_counters():
+    """Function place all counters of level near their planets, where they cover neither objects nor each other."""
+    grid = occupancy_grid()
+    for counter in service.lvl_counters:
+        counter.place(grid)
+
+
+def get_button(name):
+    """Function returns button of given name, it is created (and its image is loaded) on first use."""
+    if name not in globals():
+        globals()[name] = button_factories[name]()
+    return globals()[name]
+
+
+def is_shown(name) -> bool:
+    """Function check if button of given name is created and added to level (without creating it)."""
+    return name in globals() and service.all_buttons.has(globals()[name])
+
+
+def __getattr__(name):
+    """Function create registered button on first use of buttons.<name>."""
+    if name in button_factories:
+        return get_button(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# almost all possible buttons, they are created on first use (see get_button), not when module is imported
+button_factories = {
+    'background': lambda: Background("loading_image"),
+    'next_lvl_button': lambda: NextLevelButton(service.WIN_WIDTH - 50, 50),
+    'starting_game_button': lambda: StartingGameButton(service.WIN_WIDTH // 2, service.WIN_HEIGHT // 1.2),
+    'back_to_menu_button': lambda: BackToMenuButton(50, 50),
+    'back_to_checkpoint_button': lambda: BackToCheckpointButton(service.WIN_WIDTH // 2, service.WIN_HEIGHT // 1.2),
+    'help_button': lambda: HelpButton(service.WIN_WIDTH - 130, 50),
+    'sound_button': lambda: SoundButton(service.WIN_WIDTH - 260, 50),
+    'help_message': lambda: HelpMessage(service.WIN_WIDTH // 2, service.WIN_HEIGHT // 2),
+    'pointer_message': lambda: Pointer(service.WIN_WIDTH - 110, 230),
+    'checkpoint_sign': lambda: CheckpointSign(service.WIN_WIDTH - 200, 40),
+    'next_page_button': lambda: NextPageButton(get_button('help_message')),
+    'previous_page_button': lambda: PreviousPageButton(get_button('help_message')),
+}
@@ -1,5 +1,8 @@
 """Constants of the game"""
 FPS = 60
+GRAVITATIONAL_CONSTANT = 2000
+PHYSICS_SUBSTEPS = 1  # substeps of integrator in one physics step (one step is 1 / FPS of a second)
+MAX_STEPS_PER_FRAME = 5  # physics steps done at most in one frame, if frames are late
 colors = {"BLACK": (0, 0, 0), "GRAY": (125, 125, 125), "LIGHT_BLUE": (64, 128, 255),
           "GREEN": (0, 200, 64), "YELLOW": (225, 225, 0), "PINK": (230, 50, 230), "ORANGE": (255, 150, 100),
           'PURPLE': (125, 38, 205, 255), "RED": (255, 0, 0, 255)}
@@ -0,0 +1,259 @@
+"""Module with vectorized gravity kernels (it has no display dependency)."""
+import numpy as np
+from constants import GRAVITATIONAL_CONSTANT
+
+BLOCK_SIZE = 512  # rows of the all-pairs matrix calculated at once (bounds memory usage)
+MAX_DEPTH = 16  # deepest level of a quadtree, cells are (bounding square side) / 2 ** MAX_DEPTH
+BARNES_HUT_THRESHOLD = 2048  # number of objects from which 'auto' solver switches to Barnes-Hut
+SOLVERS = ('exact', 'barnes_hut', 'auto')
+FIELD_CELL = 4  # distance between nodes of a static field grid, in pixels
+
+
+def pairwise_forces(positions, masses, k=GRAVITATIONAL_CONSTANT):
+    """
+    Function calculate gravitational interaction of every pair of objects in one pass.
+    Param positions: array of shape (n, 2), masses: array of shape (n,).
+    Returns array of shape (n, 2) with the total force acting on every object.
+    It follows SpaceObject.gravitational_force: f = k * m_i * m_j / r ** 2 with r clamped to 1.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    if len(positions) < 2:
+        return np.zeros_like(positions)
+    x, y = positions[:, 0], positions[:, 1]
+    forces = np.empty_like(positions)
+    for start in range(0, len(positions), BLOCK_SIZE):
+        rows = slice(start, start + BLOCK_SIZE)
+        dx = x[rows, np.newaxis] - x  # dx[i, j] = x_i - x_j
+        dy = y[rows, np.newaxis] - y
+        r = np.sqrt(dx * dx + dy * dy)
+        np.maximum(r, 1, out=r)
+        # the diagonal has dx == dy == 0, so objects do not attract themselves
+        f = masses / r ** 3
+        forces[rows, 0] = -k * masses[rows] * np.einsum('ij,ij->i', f, dx)
+        forces[rows, 1] = -k * masses[rows] * np.einsum('ij,ij->i', f, dy)
+    return forces
+
+
+def pairwise_accelerations(positions, masses, k=GRAVITATIONAL_CONSTANT):
+    """Function returns accelerations (force / mass) of every object, shape (n, 2)."""
+    masses = np.asarray(masses, dtype=np.float64)
+    return pairwise_forces(positions, masses, k) / masses[:, np.newaxis]
+
+
+def field_at(points, positions, masses, k=GRAVITATIONAL_CONSTANT):
+    """
+    Function returns accelerations, that objects (par: positions, shape (n, 2), masses, shape (n,))
+    cause in given points (par: points, shape (s, 2)), shape (s, 2). Points do not attract objects back.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    d = points - np.asarray(positions, dtype=np.float64).reshape(1, -1, 2)
+    r = np.maximum(np.sqrt(np.einsum('ijk,ijk->ij', d, d)), 1)
+    f = k * np.asarray(masses, dtype=np.float64) / r ** 3
+    return -np.einsum('ij,ijk->ik', f, d)
+
+
+def tidal_at(points, positions, masses, k=GRAVITATIONAL_CONSTANT):
+    """
+    Function returns gradients of field_at (d acceleration / d point) in given points, shape (s, 2, 2).
+    Gradient of field_at inside r < 1 (where force is clamped) is taken as the one at r = 1.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    d = points - np.asarray(positions, dtype=np.float64).reshape(1, -1, 2)
+    r = np.maximum(np.sqrt(np.einsum('ijk,ijk->ij', d, d)), 1)
+    km = k * np.asarray(masses, dtype=np.float64)
+    tidal = 3 * np.einsum('ij,ijk,ijl->ikl', km / r ** 5, d, d)
+    tidal -= np.einsum('ij->i', km / r ** 3)[:, np.newaxis, np.newaxis] * np.eye(2)
+    return tidal
+
+
+def _spread_bits(v):
+    """Function interleave zero bits into 16 lower bits of given ints (par: v)."""
+    v = v & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def _morton_codes(positions):
+    """
+    Function put every point on a 2 ** MAX_DEPTH grid over a bounding square.
+    Returns (codes, side) where codes are Morton (Z-order) keys of points' cells.
+    """
+    low = positions.min(axis=0)
+    side = float((positions.max(axis=0) - low).max()) * (1 + 1e-9) or 1.0
+    cells = np.floor((positions - low) / side * 2 ** MAX_DEPTH).astype(np.int64)
+    np.clip(cells, 0, 2 ** MAX_DEPTH - 1, out=cells)
+    return _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << 1), side
+
+
+def _build_quadtree(codes, positions, masses):
+    """
+    Function build a quadtree level by level from Morton codes of objects.
+    Returns list of levels: (keys, mass, centre_of_mass, count), keys are sorted.
+    A node is a leaf if it holds one object or it is on the last level.
+    """
+    order = np.argsort(codes, kind='stable')
+    codes, positions, masses = codes[order], positions[order], masses[order]
+    weighted = positions * masses[:, np.newaxis]
+    levels = []
+    for level in range(MAX_DEPTH + 1):
+        keys = codes >> (2 * (MAX_DEPTH - level))
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        mass = np.add.reduceat(masses, starts)
+        centre = np.add.reduceat(weighted, starts, axis=0) / mass[:, np.newaxis]
+        count = np.diff(np.append(starts, len(keys)))
+        levels.append((keys[starts], mass, centre, count))
+        if count.max() == 1:  # deeper levels would be the same
+            break
+    return levels
+
+
+def _tree_forces(levels, side, codes, positions, masses, in_tree, theta, k):
+    """
+    Function walk quadtree (par: levels) for all objects at once and return their forces.
+    Node is used as a single mass if it is a leaf or if size / distance < theta and object is not inside.
+    """
+    n = len(positions)
+    forces = np.zeros((n, 2))
+    bodies = np.arange(n)
+    nodes = np.zeros(n, dtype=np.int64)
+    last = len(levels) - 1
+    for level, (keys, mass, centre, count) in enumerate(levels):
+        if not len(bodies):
+            break
+        shift = 2 * (MAX_DEPTH - level)
+        inside = (codes[bodies] >> shift) == keys[nodes]
+        node_mass = mass[nodes]
+        node_centre = centre[nodes]
+        d = positions[bodies] - node_centre
+        r = np.sqrt(np.einsum('ij,ij->i', d, d))
+        accept = (count[nodes] == 1) | (level == last) | (~inside & (side / 2 ** level < theta * r))
+
+        # object can be inside an accepted leaf only, take it out of the node
+        own = accept & inside & in_tree[bodies]
+        if own.any():
+            own_mass = masses[bodies[own]]
+            rest_mass = node_mass[own] - own_mass
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rest_centre = ((node_centre[own] * node_mass[own, np.newaxis] -
+                                positions[bodies[own]] * own_mass[:, np.newaxis]) / rest_mass[:, np.newaxis])
+            node_mass[own] = rest_mass
+            node_centre[own] = np.where(rest_mass[:, np.newaxis] == 0, positions[bodies[own]], rest_centre)
+            d[own] = positions[bodies[own]] - node_centre[own]
+            r[own] = np.sqrt(np.einsum('ij,ij->i', d[own], d[own]))
+
+        if accept.any():
+            b = bodies[accept]
+            f = k * masses[b] * node_mass[accept] / np.maximum(r[accept], 1) ** 3
+            forces[:, 0] -= np.bincount(b, weights=f * d[accept, 0], minlength=n)
+            forces[:, 1] -= np.bincount(b, weights=f * d[accept, 1], minlength=n)
+
+        # open the rest of nodes: replace each (object, node) pair with (object, child) pairs
+        bodies, nodes = bodies[~accept], nodes[~accept]
+        if level == last or not len(bodies):
+            break
+        child_keys = levels[level + 1][0]
+        first = keys[nodes] << 2
+        lo = np.searchsorted(child_keys, first)
+        num = np.searchsorted(child_keys, first + 4) - lo
+        bodies = np.repeat(bodies, num)
+        offsets = np.arange(num.sum()) - np.repeat(np.cumsum(num) - num, num)
+        nodes = np.repeat(lo, num) + offsets
+    return forces
+
+
+def barnes_hut_forces(positions, masses, theta=0.5, k=GRAVITATIONAL_CONSTANT):
+    """
+    Function approximate gravitational interaction of objects with Barnes-Hut quadtree in O(n log n).
+    Param theta: opening angle; 0 gives exact result, bigger values are faster and less accurate.
+    Objects with positive and negative (repelling) masses are put in separate trees,
+    so centre of mass of every node is well defined.
+    Returns array of shape (n, 2) with the total force acting on every object.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    forces = np.zeros_like(positions)
+    if len(positions) < 2:
+        return forces
+    codes, side = _morton_codes(positions)
+    for in_tree in (masses > 0, masses < 0):
+        if in_tree.any():
+            levels = _build_quadtree(codes[in_tree], positions[in_tree], masses[in_tree])
+            forces += _tree_forces(levels, side, codes, positions, masses, in_tree, theta, k)
+    return forces
+
+
+def forces(positions, masses, solver='exact', theta=0.5, k=GRAVITATIONAL_CONSTANT):
+    """
+    Function calculate forces with given solver (par: solver, one of SOLVERS).
+    'auto' use exact all-pairs kernel for small number of objects and Barnes-Hut for big one.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown gravity solver: {solver!r}, expected one of {SOLVERS}")
+    if solver == 'barnes_hut' or (solver == 'auto' and len(positions) >= BARNES_HUT_THRESHOLD):
+        return barnes_hut_forces(positions, masses, theta, k)
+    return pairwise_forces(positions, masses, k)
+
+
+class StaticField:
+    """
+    Acceleration field of immovable objects, precomputed on a grid.
+    Acceleration in any point is taken by bilinear interpolation of four nearest nodes in O(1).
+    """
+
+    def __init__(self, positions, masses, width, height, cell=FIELD_CELL, sources=(), k=GRAVITATIONAL_CONSTANT):
+        self.sources = frozenset(sources)  # objects field was built from (they are skipped in pairwise math)
+        self.cell = cell
+        self.width = width
+        self.height = height
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        masses = np.asarray(masses, dtype=np.float64)
+        xs = np.arange(max(int(np.ceil(width / cell)) + 1, 2)) * float(cell)
+        ys = np.arange(max(int(np.ceil(height / cell)) + 1, 2)) * float(cell)
+        self.__grid = np.zeros((len(ys), len(xs), 2))  # grid[row, col] = (ax, ay)
+        for (px, py), mass in zip(positions, masses):
+            dx = xs[np.newaxis, :] - px
+            dy = ys[:, np.newaxis] - py
+            r = np.maximum(np.sqrt(dx * dx + dy * dy), 1)
+            f = k * mass / r ** 3
+            self.__grid[:, :, 0] -= f * dx
+            self.__grid[:, :, 1] -= f * dy
+
+    def sample(self, positions):
+        """
+        Method returns accelerations in given points (par: positions, shape (n, 2)).
+        Points out of the grid take value of the nearest border.
+        """
+        grid = self.__grid
+        rows, cols = grid.shape[:2]
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        gx = np.minimum(np.maximum(positions[:, 0] / self.cell, 0), cols - 1)
+        gy = np.minimum(np.maximum(positions[:, 1] / self.cell, 0), rows - 1)
+        x0 = np.minimum(gx.astype(np.int64), cols - 2)
+        y0 = np.minimum(gy.astype(np.int64), rows - 2)
+        tx = (gx - x0)[:, np.newaxis]
+        ty = (gy - y0)[:, np.newaxis]
+        top = grid[y0, x0] * (1 - tx) + grid[y0, x0 + 1] * tx
+        bottom = grid[y0 + 1, x0] * (1 - tx) + grid[y0 + 1, x0 + 1] * tx
+        return top * (1 - ty) + bottom * ty
+
+    def sample_point(self, x, y):
+        """Method returns acceleration (ax, ay) in one point, it avoids array overhead of sample()."""
+        grid = self.__grid
+        rows, cols = grid.shape[:2]
+        gx = min(max(x / self.cell, 0), cols - 1)
+        gy = min(max(y / self.cell, 0), rows - 1)
+        x0 = min(int(gx), cols - 2)
+        y0 = min(int(gy), rows - 2)
+        tx = gx - x0
+        ty = gy - y0
+        item = grid.item
+        res = []
+        for i in (0, 1):
+            top = item(y0, x0, i) * (1 - tx) + item(y0, x0 + 1, i) * tx
+            bottom = item(y0 + 1, x0, i) * (1 - tx) + item(y0 + 1, x0 + 1, i) * tx
+            res.append(top * (1 - ty) + bottom * ty)
+        return res
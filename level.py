@@ -1,16 +1,26 @@
 """Module with levels implementation."""
+import os
+from collections.abc import Mapping
 from pygame.locals import *
 from service import *
 from planets import *
 from buttons import *
 from sys import exit
+import buttons
+import level_data
+import physics
+import render
+import replay
+
+LEVELS_FILE = os.path.join(service.game_folder, 'levels.json')
 
 
 class Level:
     """Class that include background image, number and location of planets and asteroids."""
 
     def __init__(self, background_, planets: dict, asteroids: dict, buttons: dict, lives: int,
-                 is_checkpoint='', last_one=False, special_music=None, asteroid_to_create=True, special=False):
+                 is_checkpoint='', last_one=False, special_music=None, asteroid_to_create=True, special=False,
+                 gravity_solver='exact', opening_angle=0.5, substeps=PHYSICS_SUBSTEPS):
         self.is_last = last_one
         self.is_checkpoint = is_checkpoint
         self.not_allowed_to_cr_aster = not asteroid_to_create
@@ -20,50 +30,74 @@ class Level:
         self.buttons = pygame.sprite.Group()
         self.buttons_name = tuple(buttons.values())
         self.lives = pygame.sprite.Group()
-        self.force_vectors = {}
+        self.force_vectors = []
         self.special_music = special_music
         self.special_lvl = special
-        i = 0
+        self.gravity_solver = gravity_solver
+        self.opening_angle = opening_angle
+        self.substeps = substeps  # integrator substeps in one physics step
         x = 100
         y = WIN_HEIGHT - 50
         for elem in range(lives):
             self.lives.add(Life(x, y))
             x += 52
         for settings in planets.values():
-            self.planets.append(f"Planet(**{settings})")
+            self.planets.append(dict(settings))
         for location, force_vect in asteroids.values():
-            self.asteroids.append(f"Asteroid({location[0]}, {location[1]})")
-            self.force_vectors.update({i: f"{force_vect}"})
-            i += 1
+            self.asteroids.append(tuple(location))
+            self.force_vectors.append([float(i) for i in force_vect])
         for button in buttons.values():
             self.buttons.add(button)
         if self.is_checkpoint:
-            self.buttons.add(checkpoint_sign)
+            self.buttons.add(get_button('checkpoint_sign'))
+
+    @classmethod
+    def from_record(cls, record: level_data.LevelRecord):
+        """Method create level from compiled record of level file (see level_data.load_levels)."""
+        level_buttons = {}
+        for i, name in enumerate(record.buttons, 1):
+            button = getattr(buttons, name, None)
+            if not isinstance(button, pygame.sprite.Sprite):
+                raise ValueError(f"{record.name}.buttons: unknown button {name!r}")
+            level_buttons[i] = button
+        return cls(record.background,
+                   planets={i: dict(planet) for i, planet in enumerate(record.planets, 1)},
+                   asteroids=dict(enumerate(record.asteroids, 1)),
+                   buttons=level_buttons, lives=record.lives, **dict(record.options))
 
     def get_settings(self):
         """
         Method set level environment (changed background and set planets buttons and asteroids).
         And clear event list.
         """
+        trajectory_cache.clear()
         service.delete_all_sprites()
         pygame.event.clear()
         if self.is_checkpoint:
             service.checkpoint = self.is_checkpoint
+        service.world.solver = self.gravity_solver
+        service.world.theta = self.opening_angle
+        service.world.substeps = self.substeps
+        prepare_level_assets()
         for planet in self.planets:
-            planet_ = eval(planet)
+            planet_ = Planet(**planet)
             service.all_planet.add(planet_)
             service.all_objects.add(planet_)
             service.lvl_counters.add(SatellitesCounter(planet_))  #
-        for i in range(len(self.asteroids)):
-            asteroid = eval(self.asteroids[i])
-            asteroid.starting_direction([float(i) for i in self.force_vectors[i][1:-1].split(", ")])
-            service.all_objects.add(asteroid)  # to convert '(123, 321)' to [123, 321]
+        build_static_field()
+        build_collision_grid()
+        for location, force_vector in zip(self.asteroids, self.force_vectors):
+            asteroid = asteroid_pool.acquire(*location)
+            asteroid.starting_direction(force_vector)
+            service.all_objects.add(asteroid)
             service.available_asteroids.add(asteroid)
         for button in self.buttons:
             service.all_buttons.add(button)
         for life in self.lives:
             service.all_lives_sprites.add(life)
-        background.image = self.background
+        buttons.background.image = self.background
+        prewarm_backgrounds(upcoming_backgrounds())
+        prefetch_level_assets()
         if not service.music_on_pause:
             if self.special_music == -1:
                 play_song(random_crash_eff())
@@ -78,28 +112,30 @@ class Level:
     def normalize(self):
         """Method move all appropriate obj to right places,
         after window resize."""
-        buttons_loc = {next_lvl_button: 'service.WIN_WIDTH - 50, 50',
-                       starting_game_button: 'service.WIN_WIDTH // 2, service.WIN_HEIGHT // 1.2',
-                       back_to_menu_button: '50, 50',
-                       back_to_checkpoint_button: 'service.WIN_WIDTH // 2, service.WIN_HEIGHT // 1.2',
-                       help_button: 'service.WIN_WIDTH - 130, 50',
-                       sound_button: 'service.WIN_WIDTH - 260, 50',
-                       help_message: 'service.WIN_WIDTH // 2, service.WIN_HEIGHT // 2',
-                       pointer_message: 'service.WIN_WIDTH - 110, 230',
-                       checkpoint_sign: 'service.WIN_WIDTH - 200, 40'}
-
-        for button in all_buttons:
-            if not isinstance(button, (NextPageButton, PreviousPageButton)):
-                button.rect.center = (eval(buttons_loc[button]))
-
-        next_page_button.normalize_loc()
-        previous_page_button.normalize_loc()
+        buttons_loc = {'next_lvl_button': 'service.WIN_WIDTH - 50, 50',
+                       'starting_game_button': 'service.WIN_WIDTH // 2, service.WIN_HEIGHT // 1.2',
+                       'back_to_menu_button': '50, 50',
+                       'back_to_checkpoint_button': 'service.WIN_WIDTH // 2, service.WIN_HEIGHT // 1.2',
+                       'help_button': 'service.WIN_WIDTH - 130, 50',
+                       'sound_button': 'service.WIN_WIDTH - 260, 50',
+                       'help_message': 'service.WIN_WIDTH // 2, service.WIN_HEIGHT // 2',
+                       'pointer_message': 'service.WIN_WIDTH - 110, 230',
+                       'checkpoint_sign': 'service.WIN_WIDTH - 200, 40'}
+
+        for name, loc in buttons_loc.items():
+            if is_shown(name):  # buttons, that were not created yet, are placed on creation
+                get_button(name).rect.center = (eval(loc))
+
+        for name in ('next_page_button', 'previous_page_button'):
+            if is_shown(name):
+                get_button(name).normalize_loc()
 
         x = 100
         y = service.WIN_HEIGHT - 50
         for life in self.lives:
             life.rect.center = (x, y)
             x += 52
+        place_counters()
 
     @staticmethod
     def game_over():
@@ -113,53 +149,67 @@ class Level:
         not_to_remove_life = False
 
         # set lvl environment
+        replay.source.start_level(service.on_lvl)
         self.get_settings()
-        asteroid = Asteroid(starting_game_button.rect.center[0], WIN_HEIGHT + 50)  # to prevent crashes
+        asteroid = asteroid_pool.acquire(service.WIN_WIDTH // 2, WIN_HEIGHT + 50)  # to prevent crashes
+        physics_clock = physics.FixedTimestep(1 / FPS, MAX_STEPS_PER_FRAME)
+        renderer = render.DirtyRenderer()
+        profiler = service.profiler
+        profiler.reset()
+        scheduler = service.idle_scheduler
+        scheduler.reset()
+        frozen = None  # level under help message, see frozen_frame()
+        frozen_from = None  # background, that frozen frame was made from
 
         # lvl loop
         while still_in_lvl or service.on_pause:
-            clock.tick(FPS)
-            screen.fill(colors["BLACK"])
-            screen.blit(background.image, background.rect)
-            button_pressed = all_buttons.has(help_message)
+            profiler.begin_frame()
+            # mouse position, buttons and events
+            elapsed, pos, pressed, events = replay.source.read(clock, scheduler.idle)
+            elapsed /= 1000
+            profiler.mark('wait')
+            button_pressed = is_shown('help_message')
 
-            # define mouse position
-            pos = pygame.mouse.get_pos()
             if service.to_interrupt_press:
                 pressed = (0, 0, 0)
                 service.to_interrupt_press = False
-            else:
-                pressed = pygame.mouse.get_pressed()
-
-            # start to play music
-            if not pygame.mixer.music.get_busy():
-                fill_music_queue()
 
-            for event in pygame.event.get():
+            for event in events:
 
                 if event.type == QUIT:
+                    profiler.save()
                     pygame.quit()
                     exit()
 
                 if event.type == VIDEORESIZE:
                     service.WIN_WIDTH, service.WIN_HEIGHT = event.size
                     service.screen = pygame.display.set_mode((service.WIN_WIDTH, service.WIN_HEIGHT), pygame.RESIZABLE)
-                    background.image = self.background
+                    buttons.background.resize()
+                    renderer.invalidate()
+                    frozen = None
+                    build_static_field()
                     self.normalize()
 
+                if event.type == KEYDOWN and event.key == K_F3:
+                    profiler.toggle_hud()
+                    renderer.invalidate()
+
+                if event.type in render.REPAINT_EVENTS:
+                    renderer.invalidate()  # window was uncovered or restored, parts out of dirty rects are stale
+
                 for button in all_buttons:
                     if event.type == MOUSEBUTTONDOWN and event.button == 1 and button.is_pressed(pos):
                         still_in_lvl = not button.to_act(pos)  # depends on button
                         button_pressed = True
                         not_to_remove_life = True
-                        asteroid = Prop(*pos)
+                        asteroid = replace_sprite(asteroid, prop_pool, *pos)
 
                 # creating asteroid if needed
                 if not button_pressed and event.type == MOUSEBUTTONDOWN and event.button == 1:
                     if self.not_allowed_to_cr_aster:
-                        asteroid = Prop(*pos)
+                        asteroid = replace_sprite(asteroid, prop_pool, *pos)
                     else:
-                        asteroid = Asteroid(*pos)
+                        asteroid = replace_sprite(asteroid, asteroid_pool, *pos)
                     unavailable_asteroids.add(asteroid)
 
                 if not button_pressed and event.type == MOUSEBUTTONUP and event.button == 1:
@@ -179,16 +229,14 @@ class Level:
                     pygame.mixer.music.set_volume(pygame.mixer.music.get_volume() + 0.01)
                 elif not button_pressed and event.type == MOUSEBUTTONDOWN and event.button == 5:
                     pygame.mixer.music.set_volume(pygame.mixer.music.get_volume() - 0.01)
+            profiler.mark('events')
 
             # drawing asteroid force vector if needed
             if not button_pressed and pressed[0]:
-                screen.fill(colors["BLACK"])
-                all_objects.draw(screen)
-                screen.blit(background.image, background.rect)
-
-                pygame.draw.aaline(screen, asteroid.color, asteroid.rect.center, pos)
-                pygame.draw.circle(screen, asteroid.color, pos, 3)
-                asteroid.draw_trajectory(pos)
+                renderer.aaline(asteroid.color, asteroid.rect.center, pos)
+                renderer.circle(asteroid.color, pos, 3)
+                asteroid.draw_trajectory(pos, renderer)
+            profiler.mark('trajectory')
 
             # check whether lvl is complete
             if not button_pressed and lvl_completed():
@@ -198,29 +246,90 @@ class Level:
                 elif service.on_lvl == 'menu':
                     pass
                 else:
-                    all_buttons.add(next_lvl_button)
-                    self.normalize()
+                    if not is_shown('next_lvl_button'):  # buttons and counters are placed once, not every frame
+                        all_buttons.add(get_button('next_lvl_button'))
+                        self.normalize()
                     if to_start_special_sound:
                         play_song(winning_lib[1])
                         to_start_special_sound = False
 
             # moving asteroids and check collisions
             if not button_pressed:
-                move_with_gravity(all_objects)
-                ask_satellites(available_asteroids)
-                available_asteroids.update()
+                profiler.mark('logic')
+                for _ in range(physics_clock.steps(elapsed)):
+                    ask_satellites(available_asteroids)
+                    profiler.mark('satellites')
+                    move_asteroids(all_objects, available_asteroids)
+                    profiler.mark('gravity')
+                    is_collide(all_planet, available_asteroids)
+                    profiler.mark('collisions')
                 close_nessesary_pokeballs()
-                is_collide(all_planet, available_asteroids)
+            replay.source.check(service.world)
+            profiler.mark('logic')
+
+            # drawing lvl environment (level does not change under help message, it is drawn once)
+            if not is_shown('help_message') or frozen_from is not buttons.background.image:
+                frozen = None  # background is changed too, when stretched image is swapped for scaled one
+            if frozen is None and is_shown('help_message'):
+                frozen_from = buttons.background.image
+                frozen = frozen_frame(frozen_from)
+            if frozen is None:
+                renderer.draw_group(unavailable_asteroids)
+                renderer.draw_group(all_lives_sprites)
+                renderer.draw_group(all_planet)
+                to_animate_objects(lvl_counters, renderer)
+                renderer.draw_group(available_asteroids)
+            to_animate_objects(all_buttons, renderer)
+            hud = profiler.hud()
+            if hud is not None:
+                renderer.blit(hud, (service.WIN_WIDTH - hud.get_width() - 10,
+                                    service.WIN_HEIGHT - hud.get_height() - 10))
+            frame_background = buttons.background.image if frozen is None else frozen
+            dirty = renderer.present(pygame.display.get_surface(), frame_background)
+            moving = not button_pressed and len(available_asteroids) > 0  # asteroids are simulated
+            scheduler.frame_done(moving or pressed[0], events, dirty)
+            profiler.mark('drawing')
+            if profiler.enabled:
+                profiler.count(bodies=len(service.world), asteroids=len(available_asteroids), planets=len(all_planet),
+                               idle=int(scheduler.idle))
+            if not service.first_frame_shown:
+                service.mark_first_frame()
+
+        if not asteroid.alive():
+            asteroid.kill()
+        if service.pool_stats:
+            for pool in sprite_pools:
+                print(pool.stats())
+        profiler.save()
+
+
+def replace_sprite(sprite, pool, *args):
+    """
+    Function returns new sprite made with given arguments by pool (par: pool).
+    Old sprite (par: sprite) is killed (its body is given back), if it is not in any group.
+    """
+    if not sprite.alive():
+        sprite.kill()
+    return pool.acquire(*args)
+
 
-            # drawing lvl environment
-            unavailable_asteroids.draw(screen)
-            all_lives_sprites.draw(screen)
-            all_planet.draw(screen)
-            to_animate_objects(all_buttons)
-            to_animate_objects(lvl_counters)
-            available_asteroids.draw(screen)
-            all_buttons.draw(screen)
-            pygame.display.flip()
+def frozen_frame(image) -> pygame.Surface:
+    """Function returns copy of background (par: image) with objects of level, that are drawn under buttons."""
+    frame = image.copy()
+    for group in (unavailable_asteroids, all_lives_sprites, all_planet):
+        group.draw(frame)
+    to_animate_objects(lvl_counters, frame)
+    available_asteroids.draw(frame)
+    return frame
+
+
+def upcoming_backgrounds():
+    """Function returns backgrounds of levels, that can be started from current one."""
+    names = ['game_over_lvl']
+    if service.on_lvl.startswith('lvl_'):
+        names.append(f"lvl_{int(service.on_lvl[4:]) + 1}")
+    records = levels.records
+    return [records[name].background for name in names if name in records]
 
 
 def remove_life():
@@ -235,73 +344,37 @@ def remove_life():
         return False
 
 
+class LevelPack(Mapping):
+    """
+    Levels of level file by their names. File is compiled once (see level_data.load_levels),
+    level is created when it is asked for the first time (and again after file is changed).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__levels = {}
+        self.__records = None  # records, that levels were created from
+
+    @property
+    def records(self) -> dict:
+        """Returns compiled records of all levels of file."""
+        return level_data.load_levels(self.path)
+
+    def __getitem__(self, name) -> Level:
+        records = self.records
+        if records is not self.__records:  # file was changed and compiled again, created levels are stale
+            self.__levels = {}
+            self.__records = records
+        if name not in self.__levels:
+            self.__levels[name] = Level.from_record(records[name])
+        return self.__levels[name]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+
 # levels initializing
-menu = Level(background_="starting_menu_background",
-             planets={1: {'x': service.WIN_WIDTH // 5.21, 'y': service.WIN_HEIGHT // 4.3, 'condition': 1}},
-             asteroids={1: ((service.WIN_WIDTH // 10.4347, service.WIN_HEIGHT // 4.14507),
-                            (service.WIN_WIDTH // 11.320754, service.WIN_HEIGHT // 2.64900))},
-             buttons={1: starting_game_button, 2: help_button, 3: sound_button, 4: pointer_message},
-             lives=0, special=True)
-
-lvl_1 = Level(background_="background_1",
-              planets={1: {'x': service.WIN_WIDTH // 2, 'y': service.WIN_HEIGHT // 2, 'condition': 2}},
-              asteroids={1: ((service.WIN_WIDTH // 2, service.WIN_WIDTH // 2),  # i know
-                             (service.WIN_WIDTH // 2 - 135, service.WIN_HEIGHT // 2 + 134))},
-              buttons={1: back_to_menu_button, 2: help_button, 3: sound_button},
-              lives=6,
-              is_checkpoint='lvl_1')
-
-lvl_2 = Level(background_="background_2",
-              planets={1: {'x': service.WIN_WIDTH // 2 - 200, "y": service.WIN_HEIGHT // 2, 'condition': 1},
-                       2: {'x': service.WIN_WIDTH // 2 + 200, "y": service.WIN_HEIGHT // 2, 'condition': 1}},
-              asteroids={},
-              buttons={1: back_to_menu_button, 2: help_button, 3: sound_button},
-              lives=4)
-
-lvl_3 = Level(background_="background_3",
-              planets={1: {'x': service.WIN_WIDTH // 2 - 50, "y": service.WIN_HEIGHT // 2 - 50, 'condition': 1},
-                       2: {'x': service.WIN_WIDTH // 2 + 50, "y": service.WIN_HEIGHT // 2 - 50, 'condition': 1},
-                       3: {'x': service.WIN_WIDTH // 2 + 50, "y": service.WIN_HEIGHT // 2 + 50, 'condition': 1},
-                       4: {'x': service.WIN_WIDTH // 2 - 50, "y": service.WIN_HEIGHT // 2 + 50, 'condition': 1}},
-              asteroids={1: ((service.WIN_WIDTH // 2, service.WIN_WIDTH // 2),  # i know
-                             (service.WIN_WIDTH // 2 - 135, service.WIN_HEIGHT // 2 + 134))},
-              buttons={1: back_to_menu_button, 2: help_button, 3: sound_button},
-              lives=6,
-              is_checkpoint='lvl_3')
-
-lvl_4 = Level(background_="background_4",
-              planets={1: {'x': service.WIN_WIDTH // 2 - 200, "y": service.WIN_HEIGHT // 2 - 200, 'condition': 0,
-                           'mass': -10},
-                       2: {'x': service.WIN_WIDTH // 2 + 200, "y": service.WIN_HEIGHT // 2 - 200, 'condition': 0,
-                           'mass': -10},
-                       3: {'x': service.WIN_WIDTH // 2 + 200, "y": service.WIN_HEIGHT // 2 + 200, 'condition': 0,
-                           'mass': -10},
-                       4: {'x': service.WIN_WIDTH // 2 - 200, "y": service.WIN_HEIGHT // 2 + 200, 'condition': 0,
-                           'mass': -10},
-                       5: {'x': service.WIN_WIDTH // 2 - 200, "y": service.WIN_HEIGHT // 2, 'condition': 0,
-                           'mass': -10},
-                       6: {'x': service.WIN_WIDTH // 2 + 200, "y": service.WIN_HEIGHT // 2, 'condition': 0,
-                           'mass': -10},
-                       7: {'x': service.WIN_WIDTH // 2, "y": service.WIN_HEIGHT // 2 + 200, 'condition': 0,
-                           'mass': -10},
-                       8: {'x': service.WIN_WIDTH // 2, "y": service.WIN_HEIGHT // 2 - 200, 'condition': 0,
-                           'mass': -10},
-                       9: {'x': service.WIN_WIDTH // 2, "y": service.WIN_HEIGHT // 2, 'condition': 1,
-                           'mass': 1}},
-
-              asteroids={},
-              buttons={1: back_to_menu_button, 2: help_button, 3: sound_button},
-              lives=4,
-              last_one=True)
-
-game_over_lvl = Level(background_="game_over_background",
-                      planets={1: {'x': service.WIN_WIDTH // 2, "y": service.WIN_HEIGHT // 0.2, 'condition': 0}},
-                      asteroids={},
-                      buttons={1: back_to_menu_button, 2: back_to_checkpoint_button, 3: help_button, 4: sound_button},
-                      lives=0, special_music=-1, asteroid_to_create=False, special=True)
-
-win_lvl = Level(background_="winning_background",
-                planets={1: {'x': service.WIN_WIDTH // 2, "y": service.WIN_HEIGHT // 0.2, 'condition': 0}},
-                asteroids={},
-                buttons={1: back_to_menu_button, 3: help_button, 4: sound_button},
-                lives=0, special_music=1, asteroid_to_create=False, special=True)
+levels = LevelPack(LEVELS_FILE)
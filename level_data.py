@@ -0,0 +1,94 @@
+"""Module with loader of level files: levels are described as data (see levels.json), not as code."""
+import json
+import os
+from collections import namedtuple
+import gravity
+
+# compiled level, it is ready to be turned into Level (planets are tuples of (key, value) pairs of Planet arguments)
+LevelRecord = namedtuple('LevelRecord', ['name', 'background', 'planets', 'asteroids', 'buttons', 'lives', 'options'])
+
+NUMBER = (int, float)
+REQUIRED = {'background': str, 'planets': list, 'asteroids': list, 'buttons': list, 'lives': int}
+OPTIONS = {'is_checkpoint': str, 'last_one': bool, 'special_music': (int, type(None)), 'asteroid_to_create': bool,
+           'special': bool, 'gravity_solver': str, 'opening_angle': NUMBER, 'substeps': int}  # arguments of Level
+PLANET_FIELDS = {'x': NUMBER, 'y': NUMBER, 'condition': int, 'mass': NUMBER}
+ASTEROID_FIELDS = {'x': NUMBER, 'y': NUMBER, 'aim': list}
+
+_compiled = {}  # path of level file: (time of modification, {name: LevelRecord})
+
+
+def _check_type(value, types, where):
+    """Function raise ValueError, if value has not one of given types (bool is not taken for a number)."""
+    types = types if isinstance(types, tuple) else (types,)
+    if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+        names = ' or '.join(t.__name__ for t in types)
+        raise ValueError(f"{where}: expected {names}, got {value!r}")
+
+
+def _check_fields(data, fields, required, where):
+    """Function check that dict (par: data) has only known fields of right types and all required ones."""
+    _check_type(data, dict, where)
+    for key, value in data.items():
+        if key not in fields:
+            raise ValueError(f"{where}: unknown field {key!r}")
+        _check_type(value, fields[key], f"{where}.{key}")
+    for key in required:
+        if key not in data:
+            raise ValueError(f"{where}: field {key!r} is missing")
+
+
+def compile_level(name, data) -> LevelRecord:
+    """Function validate level description (par: data, parsed from level file) and returns its LevelRecord."""
+    _check_fields(data, {**REQUIRED, **OPTIONS}, REQUIRED, name)
+    if data['lives'] < 0:
+        raise ValueError(f"{name}.lives: must not be negative")
+    if data.get('substeps', 1) < 1:
+        raise ValueError(f"{name}.substeps: must be positive")
+    if data.get('gravity_solver', 'exact') not in gravity.SOLVERS:
+        raise ValueError(f"{name}.gravity_solver: expected one of {gravity.SOLVERS}")
+
+    planets = []
+    for i, planet in enumerate(data['planets']):
+        where = f"{name}.planets[{i}]"
+        _check_fields(planet, PLANET_FIELDS, ('x', 'y', 'condition'), where)
+        if planet['condition'] < 0:
+            raise ValueError(f"{where}.condition: must not be negative")
+        if planet.get('mass', 1) == 0:
+            raise ValueError(f"{where}.mass: must not be zero")
+        planets.append(tuple(planet.items()))
+
+    asteroids = []
+    for i, asteroid in enumerate(data['asteroids']):
+        where = f"{name}.asteroids[{i}]"
+        _check_fields(asteroid, ASTEROID_FIELDS, tuple(ASTEROID_FIELDS), where)
+        aim = asteroid['aim']
+        if len(aim) != 2:
+            raise ValueError(f"{where}.aim: expected [x, y], got {aim!r}")
+        for value in aim:
+            _check_type(value, NUMBER, f"{where}.aim")
+        asteroids.append(((asteroid['x'], asteroid['y']), tuple(aim)))
+
+    for i, button in enumerate(data['buttons']):
+        _check_type(button, str, f"{name}.buttons[{i}]")
+
+    options = tuple((key, data[key]) for key in OPTIONS if key in data)
+    return LevelRecord(name, data['background'], tuple(planets), tuple(asteroids), tuple(data['buttons']),
+                       data['lives'], options)
+
+
+def load_levels(path) -> dict:
+    """
+    Function returns {name: LevelRecord} of all levels of level file (in order of the file).
+    File is parsed and compiled once, later the same records are returned until file is changed.
+    """
+    path = os.path.abspath(path)
+    modified = os.path.getmtime(path)
+    cached = _compiled.get(path)
+    if cached is not None and cached[0] == modified:
+        return cached[1]
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    _check_type(data, dict, path)
+    levels = {name: compile_level(name, level) for name, level in data.items()}
+    _compiled[path] = (modified, levels)
+    return levels
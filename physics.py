@@ -0,0 +1,316 @@
+"""Module with headless simulation engine (it has no display, pygame or service dependency)."""
+import math
+import numpy as np
+import gravity
+from constants import GRAVITATIONAL_CONSTANT, PHYSICS_SUBSTEPS
+
+VELOCITY_SCALE = 1 / 9  # in one step (dt = 1) objects are moved by velocity * VELOCITY_SCALE
+SMALL_GROUP = 8  # for smaller groups plain python loop is faster than array calls
+
+
+def snap(values):
+    """Function round array of coordinates to whole pixels the way pygame.Rect does (half away from zero)."""
+    return np.copysign(np.floor(np.abs(values) + 0.5), values)
+
+
+def snap_number(value):
+    """Function do the same as snap() for one number."""
+    return math.copysign(math.floor(abs(value) + 0.5), value)
+
+
+def orbital_elements(positions, velocities, centres, masses, k=GRAVITATIONAL_CONSTANT):
+    """
+    Function calculate two-body orbits of every body (par: positions, velocities, shape (n, 2))
+    around every attracting centre (par: centres, shape (m, 2), masses, shape (m,), masses > 0) in one pass.
+    Velocities are the ones of World (in one step body moves by velocity * VELOCITY_SCALE).
+    Returns (energy, momentum, periapsis, apoapsis, box), arrays of shape (n, m):
+    specific orbital energy, specific angular momentum, nearest and farthest distance to centre
+    and box of orbit ellipse (left, top, right, bottom), shape (n, m, 4).
+    Orbits with energy >= 0 are not closed, their apoapsis and box are inf.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 1, 2)
+    u = np.asarray(velocities, dtype=np.float64).reshape(-1, 1, 2) * VELOCITY_SCALE
+    centres = np.asarray(centres, dtype=np.float64).reshape(1, -1, 2)
+    # in one step velocity changes by acceleration and position by velocity * VELOCITY_SCALE
+    mu = k * np.asarray(masses, dtype=np.float64).reshape(1, -1) * VELOCITY_SCALE
+    d = positions - centres
+    r = np.maximum(np.sqrt(np.einsum('ijk,ijk->ij', d, d)), 1)
+    speed2 = np.einsum('ijk,ijk->ij', u, u)[:, :1]
+    energy = speed2 / 2 - mu / r
+    momentum = d[..., 0] * u[..., 1] - d[..., 1] * u[..., 0]
+    radial = np.einsum('ijk,ijk->ij', d, np.broadcast_to(u, d.shape))
+    eccentricity = ((speed2 - mu / r)[..., np.newaxis] * d - radial[..., np.newaxis] * u) / mu[..., np.newaxis]
+    e = np.sqrt(np.einsum('ijk,ijk->ij', eccentricity, eccentricity))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bound = energy < 0
+        semi_major = np.where(bound, -mu / (2 * energy), np.inf)
+        periapsis = np.where(bound, semi_major * (1 - e), momentum ** 2 / (mu * (1 + e)))
+        apoapsis = np.where(bound, semi_major * (1 + e), np.inf)
+        semi_minor = semi_major * np.sqrt(np.maximum(1 - e ** 2, 0))
+        cos = np.where(e > 0, eccentricity[..., 0] / e, 1)
+        sin = np.where(e > 0, eccentricity[..., 1] / e, 0)
+    half_w = np.sqrt((semi_major * cos) ** 2 + (semi_minor * sin) ** 2)
+    half_h = np.sqrt((semi_major * sin) ** 2 + (semi_minor * cos) ** 2)
+    # centre is the focus of ellipse, the middle of ellipse is on the side of apoapsis
+    mid_x = np.where(bound, centres[..., 0] - semi_major * eccentricity[..., 0], np.nan)
+    mid_y = np.where(bound, centres[..., 1] - semi_major * eccentricity[..., 1], np.nan)
+    box = np.stack([mid_x - half_w, mid_y - half_h, mid_x + half_w, mid_y + half_h], axis=-1)
+    box[~bound] = (-np.inf, -np.inf, np.inf, np.inf)
+    return energy, momentum, periapsis, apoapsis, box
+
+
+class World:
+    """
+    Simulation of objects (bodies) moving under gravity of each other.
+    Bodies are kept as rows of plain arrays; a body is addressed by its handle (row number).
+    Row of removed body is given to next new body; generation of row is changed, so old owner of handle
+    can not remove new body (see remove_body()).
+    Static bodies (planets) do not move; their gravity can be precomputed with build_static_field().
+    Bodies are moved with velocity Verlet (kick-drift-kick), positions are floats.
+    """
+
+    def __init__(self, capacity=64, solver='exact', theta=0.5, k=GRAVITATIONAL_CONSTANT,
+                 substeps=PHYSICS_SUBSTEPS, snap_to_pixels=False):
+        self.solver = solver  # see gravity.forces
+        self.theta = theta
+        self.k = k
+        self.substeps = substeps  # integrator substeps in one step()
+        self.snap_to_pixels = snap_to_pixels  # keep positions in whole pixels (as pygame.Rect does)
+        self.version = 0  # it is changed every time positions or set of bodies are changed
+        self.__evaluated = None  # (version, handles) accelerations were calculated for
+        self.static_field = None
+        self.positions = np.zeros((capacity, 2))
+        self.velocities = np.zeros((capacity, 2))
+        self.forces = np.zeros((capacity, 2))
+        self.accelerations = np.zeros((capacity, 2))
+        self.masses = np.zeros(capacity)
+        self.static = np.zeros(capacity, dtype=bool)
+        self.in_field = np.zeros(capacity, dtype=bool)  # gravity of body is a part of static field
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.generations = np.zeros(capacity, dtype=np.uint32)  # number of bodies, that have left the row
+        self.__free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    @property
+    def capacity(self):
+        """Returns number of rows in arrays."""
+        return len(self.masses)
+
+    @property
+    def handles(self):
+        """Returns handles of all bodies."""
+        return np.flatnonzero(self.alive)
+
+    def __grow(self):
+        """Method double size of arrays."""
+        old = self.capacity
+        for name in ('positions', 'velocities', 'forces', 'accelerations', 'masses', 'static', 'in_field', 'alive',
+                     'generations'):
+            array = getattr(self, name)
+            grown = np.zeros((old * 2,) + array.shape[1:], dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+        self.__free.extend(range(old * 2 - 1, old - 1, -1))
+
+    def add_body(self, x, y, mass, static=False) -> int:
+        """Method add body to world and returns its handle."""
+        if not self.__free:
+            self.__grow()
+        handle = self.__free.pop()
+        self.positions[handle] = (x, y)
+        self.velocities[handle] = 0
+        self.forces[handle] = 0
+        self.accelerations[handle] = 0
+        self.masses[handle] = mass
+        self.static[handle] = static
+        self.in_field[handle] = False
+        self.alive[handle] = True
+        self.version += 1
+        return handle
+
+    def set_position(self, handle, x, y):
+        """Method place body at given point (positions must not be changed in other way)."""
+        self.positions[handle] = (x, y)
+        self.version += 1
+
+    def remove_body(self, handle, generation=None):
+        """
+        Method remove body from world, its handle can be given to another body.
+        If generation of handle (par: generation, see generations) is given, body is removed only if it is the same.
+        """
+        if self.alive[handle] and (generation is None or generation == self.generations[handle]):
+            self.alive[handle] = False
+            self.generations[handle] += 1
+            if self.in_field[handle]:
+                self.drop_static_field()  # it is out of date
+            self.__free.append(handle)
+            self.version += 1
+
+    def clear(self):
+        """Method remove all bodies."""
+        self.generations[self.alive] += 1
+        self.alive[:] = False
+        self.version += 1
+        self.drop_static_field()
+        self.__free = list(range(self.capacity - 1, -1, -1))
+
+    def build_static_field(self, width, height, handles=None):
+        """
+        Method precompute gravity of given static bodies (default: all) on width x height area
+        (see gravity.StaticField). Later those bodies are not used in pairwise math.
+        """
+        if handles is None:
+            handles = np.flatnonzero(self.alive & self.static)
+        else:
+            handles = np.asarray(handles, dtype=np.int64).reshape(-1)
+            handles = handles[self.static[handles]]
+        self.drop_static_field()
+        if len(handles):
+            self.static_field = gravity.StaticField(self.positions[handles], self.masses[handles],
+                                                    width, height, sources=handles.tolist(), k=self.k)
+            self.in_field[handles] = True
+
+    def drop_static_field(self):
+        """Method remove static field, gravity of all bodies goes through pairwise math again."""
+        self.static_field = None
+        self.in_field[:] = False
+        self.version += 1
+
+    def compute_forces(self, handles=None):
+        """
+        Method calculate forces and accelerations of given bodies (default: all) caused
+        by gravity of each other. If static field is built, bodies of the field are taken from it
+        and only the rest of bodies go through pairwise math.
+        """
+        handles = self.handles if handles is None else np.asarray(handles, dtype=np.int64).reshape(-1)
+        self.__evaluated = (self.version, handles.tobytes())
+        self.forces[handles] = 0
+        self.accelerations[handles] = 0
+        field = self.static_field
+        if field is not None:
+            handles = handles[~self.in_field[handles]]
+        if len(handles) < 2 and (field is None or not len(handles)):
+            return
+        if len(handles) < SMALL_GROUP and self.solver != 'barnes_hut':
+            self.__small_group_forces(handles.tolist())
+            return
+        positions = self.positions[handles]
+        masses = self.masses[handles]
+        forces = gravity.forces(positions, masses, self.solver, self.theta, self.k)
+        if field is not None:
+            forces += field.sample(positions) * masses[:, np.newaxis]
+        self.forces[handles] = forces
+        self.accelerations[handles] = forces / masses[:, np.newaxis]
+
+    def __small_group_forces(self, handles):
+        """Method do the same as compute_forces() for a few bodies with plain python numbers."""
+        k = self.k
+        pos = [(self.positions.item(h, 0), self.positions.item(h, 1)) for h in handles]
+        masses = [self.masses.item(h) for h in handles]
+        forces = [[0.0, 0.0] for _ in handles]
+        for i in range(len(handles)):
+            for j in range(i + 1, len(handles)):
+                dx = pos[i][0] - pos[j][0]
+                dy = pos[i][1] - pos[j][1]
+                r = max(math.sqrt(dx * dx + dy * dy), 1)
+                f = (k * masses[i] * masses[j]) / (r ** 2)
+                forces[i][0] -= f * dx / r
+                forces[i][1] -= f * dy / r
+                forces[j][0] += f * dx / r
+                forces[j][1] += f * dy / r
+        field = self.static_field
+        for (x, y), mass, force, h in zip(pos, masses, forces, handles):
+            if field is not None:
+                ax, ay = field.sample_point(x, y)
+                force[0] += ax * mass
+                force[1] += ay * mass
+            self.forces[h] = force
+            self.accelerations[h] = (force[0] / mass, force[1] / mass)
+
+    def kick(self, handles, dt):
+        """Method change velocities of given bodies by their accelerations for time dt."""
+        if len(handles) < SMALL_GROUP:
+            for h in handles:
+                self.velocities[h, 0] += self.accelerations.item(h, 0) * dt
+                self.velocities[h, 1] += self.accelerations.item(h, 1) * dt
+        else:
+            self.velocities[handles] += self.accelerations[handles] * dt
+
+    def drift(self, handles, dt):
+        """Method change positions of given bodies by their velocities for time dt."""
+        if len(handles) < SMALL_GROUP:
+            for h in handles:
+                x = self.positions.item(h, 0) + self.velocities.item(h, 0) * VELOCITY_SCALE * dt
+                y = self.positions.item(h, 1) + self.velocities.item(h, 1) * VELOCITY_SCALE * dt
+                if self.snap_to_pixels:
+                    x, y = snap_number(x), snap_number(y)
+                self.positions[h] = (x, y)
+        else:
+            positions = self.positions[handles] + self.velocities[handles] * (VELOCITY_SCALE * dt)
+            self.positions[handles] = snap(positions) if self.snap_to_pixels else positions
+        self.version += 1
+
+    def step(self, handles=None, movers=None, dt=1.0, substeps=None):
+        """
+        Method advance simulation by time dt (one step is one frame of the original game)
+        in given number of substeps (default: self.substeps). Gravity of given bodies (default: all)
+        is calculated and movers (default: not static of them) are moved with velocity Verlet.
+        Accelerations of the end of previous step are used again, if bodies were not changed
+        since then, so every substep costs one calculation of forces.
+        """
+        handles = self.handles if handles is None else np.asarray(handles, dtype=np.int64).reshape(-1)
+        if movers is None:
+            movers = handles[~self.static[handles]]
+        movers = np.asarray(movers, dtype=np.int64).reshape(-1)
+        if len(movers) < SMALL_GROUP:
+            movers = movers.tolist()
+        substeps = self.substeps if substeps is None else substeps
+        h = dt / substeps
+        if self.__evaluated != (self.version, handles.tobytes()):
+            self.compute_forces(handles)
+        for _ in range(substeps):
+            self.kick(movers, h / 2)
+            self.drift(movers, h)
+            self.compute_forces(handles)
+            self.kick(movers, h / 2)
+
+    def run(self, steps, handles=None, movers=None, dt=1.0, substeps=None):
+        """Method advance simulation by given number of steps as fast as possible."""
+        for _ in range(steps):
+            self.step(handles, movers, dt, substeps)
+
+    def out_of_bounds(self, width, height, handles=None):
+        """Method returns handles of bodies (default: all) out of width x height area."""
+        handles = self.handles if handles is None else np.asarray(handles, dtype=np.int64)
+        x, y = self.positions[handles, 0], self.positions[handles, 1]
+        return handles[(x < 0) | (x > width) | (y < 0) | (y > height)]
+
+
+class FixedTimestep:
+    """
+    Scheduler of physics steps of fixed length. Real time of frames is put in accumulator
+    and taken from it by whole steps, so speed of simulation does not depend on frame rate:
+    if a frame is late, several steps are done in it.
+    """
+
+    def __init__(self, step_time, max_steps=5):
+        self.step_time = step_time  # in seconds
+        self.max_steps = max_steps  # more steps in one frame would make next frame even later
+        self.accumulator = 0.0
+
+    def steps(self, elapsed) -> int:
+        """Method add elapsed real time (in seconds) and returns number of steps to do in this frame."""
+        self.accumulator += elapsed
+        steps = int((self.accumulator + 1e-9) // self.step_time)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = 0.0  # simulation falls behind instead of trying to catch up forever
+        else:
+            self.accumulator = max(self.accumulator - steps * self.step_time, 0.0)
+        return steps
+
+    def reset(self):
+        """Method drop time left in accumulator."""
+        self.accumulator = 0.0
@@ -1,48 +1,163 @@
 """Module with main game objects."""
 import math
 import time
+from collections import OrderedDict
+import numpy as np
 import pygame
+import gravity
+import physics
 import service
 
+TRAJECTORY_LENGTH = 200  # max number of points in trajectory preview
+ORBIT_STEPS = 20  # asteroid becomes a satellite after so many physics steps on a closed orbit
+
+
+def body_attribute(array, column=None):
+    """Function returns property, that read and write given cell of body row in world arrays."""
+    if column is None:
+        def fget(self):
+            return getattr(self.world, array).item(self.body)
+    else:
+        def fget(self):
+            return getattr(self.world, array).item(self.body, column)
+
+    def fset(self, value):
+        getattr(self.world, array)[(self.body, column) if column is not None else self.body] = value
+    return property(fget, fset, doc=f"Value of world.{array} of object body.")
+
+
+class BodyRect(pygame.Rect):
+    """
+    Rectangle of SpaceObject (see SpaceObject.rect). It is placed at position of object body, when it is read;
+    moving it (by attributes or by *_ip methods) moves the body in world. Copies of it are plain rectangles.
+    """
+    __slots__ = ('sprite',)
+
+    def __setattr__(self, name, value):
+        topleft = self.topleft
+        super().__setattr__(name, value)
+        _move_body(self, topleft)
+
+
+def _move_body(rect, topleft):
+    """Function move body of rectangle (par: rect, BodyRect), if rectangle was moved from topleft."""
+    sprite = getattr(rect, 'sprite', None)
+    if sprite is None or rect.topleft == topleft:
+        return
+    x, y = sprite.world.positions[sprite.body].tolist()  # coordinate, that was not changed, keeps its fraction
+    sprite.world.set_position(sprite.body, x if rect.x == topleft[0] else rect.x, y if rect.y == topleft[1] else rect.y)
+
+
+def _moving_method(method):
+    """Function returns method of BodyRect, that do the same as method of pygame.Rect and moves body."""
+    def moving(rect, *args, **kwargs):
+        topleft = rect.topleft
+        result = method(rect, *args, **kwargs)
+        _move_body(rect, topleft)
+        return result
+    moving.__name__, moving.__doc__ = method.__name__, method.__doc__
+    return moving
+
+
+def _plain_method(method):
+    """Function returns method of BodyRect, that do the same as method of pygame.Rect on plain copy of rectangle."""
+    def plain(rect, *args, **kwargs):
+        return method(pygame.Rect(rect), *args, **kwargs)
+    plain.__name__, plain.__doc__ = method.__name__, method.__doc__
+    return plain
+
+
+for _name in ('move_ip', 'inflate_ip', 'scale_by_ip', 'update', 'clamp_ip', 'union_ip', 'unionall_ip', 'normalize'):
+    if hasattr(pygame.Rect, _name):
+        setattr(BodyRect, _name, _moving_method(getattr(pygame.Rect, _name)))
+for _name in ('copy', '__copy__', 'move', 'inflate', 'scale_by', 'clamp', 'clip', 'union', 'unionall', 'fit'):
+    if hasattr(pygame.Rect, _name):  # new rectangles made of BodyRect are plain ones, they do not move body
+        setattr(BodyRect, _name, _plain_method(getattr(pygame.Rect, _name)))
+_place_rect = pygame.Rect.topleft.__set__  # it places BodyRect at body position without moving body
+
 
 class SpaceObject(pygame.sprite.Sprite):
     """
-    Abstract class.
+    Abstract class. It is a view of a body in physics.World (service.world by default):
+    position, velocity, force and mass are kept in world arrays and rect is placed by them.
+    Body is given back to world by kill() (or when object is given back to its pool), place() takes a new one.
+    Own attributes of objects are kept in __slots__ (only groups of pygame.sprite.Sprite stay in __dict__).
     """
+    __slots__ = ('world', 'body', 'generation', 'image', '__rect')
+    static = False  # static bodies do not move
+
+    vx, vy = body_attribute('velocities', 0), body_attribute('velocities', 1)
+    ax, ay = body_attribute('accelerations', 0), body_attribute('accelerations', 1)
+    fx, fy = body_attribute('forces', 0), body_attribute('forces', 1)
+    mass = body_attribute('masses')
 
-    def __init__(self, x, y, mass, img):
+    def __init__(self, x, y, mass, img, world=None):
         super().__init__()
+        self.world = service.world if world is None else world
+        self.image = img  # images are shared, they are prepared by service (see service.assets)
+        rect = self.image.get_rect(center=(x, y))
+        self.body = self.world.add_body(*rect.topleft, mass, static=self.static)
+        self.generation = self.world.generations.item(self.body)
+        self.rect = rect
+
+    def place(self, x, y, mass, img):
+        """
+        Method give object new image and mass and put it at rest with centre in given point (par: x, y).
+        Object, whose body was given back to world, takes a new body.
+        """
         self.image = img
-        self.image.set_colorkey(service.colors["BLACK"])
-        self.rect = self.image.get_rect()
-        self.rect.center = (x, y)
-        self.ax = 1
-        self.ay = 1
-        self.vx = 0
-        self.vy = 0
-        self.fx = 0
-        self.fy = 0
+        if not self.has_body():
+            self.body = self.world.add_body(0, 0, mass, static=self.static)
+            self.generation = self.world.generations.item(self.body)
         self.mass = mass
+        self.world.velocities[self.body] = 0
+        self.world.forces[self.body] = 0
+        self.world.accelerations[self.body] = 0
+        self.rect = self.image.get_rect(center=(x, y))
 
-    def draw(self):
-        """Method draw objects."""
-        service.screen.blit(self.image, self.rect.center)
+    def has_body(self) -> bool:
+        """Method returns whether body of object is in world (it was not given back)."""
+        return bool(self.world.alive[self.body]) and self.world.generations.item(self.body) == self.generation
+
+    def free_body(self):
+        """Method give body of object back to world (nothing happens, if it is given back already)."""
+        self.world.remove_body(self.body, self.generation)
+
+    @property
+    def rect(self):
+        """Returns rectangle of object placed at its body position (moving rectangle moves body, see BodyRect)."""
+        _place_rect(self.__rect, (self.world.positions.item(self.body, 0), self.world.positions.item(self.body, 1)))
+        return self.__rect
+
+    @rect.setter
+    def rect(self, rect):
+        self.__rect = BodyRect(rect)
+        self.__rect.sprite = self
+        self.world.set_position(self.body, *rect.topleft)
+
+    def kill(self):
+        """Method remove object from all groups and from service.collision_grid and give its body back to world."""
+        super().kill()
+        service.collision_grid.remove(self)
+        self.free_body()
+
+    def draw(self, surface=None):
+        """Method draw objects (on service.screen by default)."""
+        (service.screen if surface is None else surface).blit(self.image, self.rect.center)
 
     def reset_forses(self):
         """
         Method reset values of self.f{x, y} and self.a{x, y}.
         """
-        self.fx = 0
-        self.fy = 0
-        self.ax = 1
-        self.ay = 1
+        self.world.forces[self.body] = 0
+        self.world.accelerations[self.body] = 1
 
     def gravitational_force(self, other):
         """
         Method calculate gravitational interaction of two objects and change
         .ax, .ay of those objects.
         """
-        k = 2000  # gravitational constant
+        k = service.GRAVITATIONAL_CONSTANT
         dx = self.rect.x - other.rect.x  # calculate the distance between object centres
         dy = self.rect.y - other.rect.y
         r = math.sqrt(dx ** 2 + dy ** 2)
@@ -54,21 +169,19 @@ class SpaceObject(pygame.sprite.Sprite):
         fx = f * dx / r
         fy = f * dy / r
 
-        self.fx -= fx  # first object`s force
-        self.fy -= fy
-        other.fx += fx  # second object`s force in opposite direction
-        other.fy += fy
-
-        self.ax = self.fx / self.mass
-        self.ay = self.fy / self.mass
-        other.ax = other.fx / other.mass
-        other.ay = other.fy / other.mass
+        forces, accelerations = self.world.forces, self.world.accelerations
+        forces[self.body] -= (fx, fy)  # first object`s force
+        forces[other.body] += (fx, fy)  # second object`s force in opposite direction
+        accelerations[self.body] = forces[self.body] / self.mass
+        accelerations[other.body] = forces[other.body] / other.mass
 
 
 class Planet(SpaceObject):
     """
     Сlass for visible game objects with own size, gravitation, color and location.
     """
+    __slots__ = ('__condition', '__satellites', '__time_open')
+    static = True
 
     def __init__(self, x, y, condition, mass=30):
         if mass < 0:
@@ -79,9 +192,9 @@ class Planet(SpaceObject):
         self.__satellites = pygame.sprite.Group()
         self.__time_open = None  # atr. used to change icon
 
-    def draw(self):
-        """Method draw objects."""
-        service.screen.blit(self.image, (self.rect.x, self.rect.y))
+    def draw(self, surface=None):
+        """Method draw objects (on service.screen by default)."""
+        (service.screen if surface is None else surface).blit(self.image, (self.rect.x, self.rect.y))
 
     @property
     def condition(self):
@@ -103,6 +216,10 @@ class Planet(SpaceObject):
         if asteroid not in self.__satellites:
             self.__satellites.add(asteroid)
 
+    def add_satellites(self, asteroids):
+        """Add several asteroids as satellites of planet at once."""
+        self.__satellites.add(*asteroids)
+
     def passed(self):
         """Method returns whether enough satellites are moving round the planet."""
         return self.condition == 0
@@ -116,7 +233,6 @@ class Planet(SpaceObject):
             pass
         else:
             self.image = service.close_planet_img
-            self.image.set_colorkey(service.colors["BLACK"])
         self.__time_open = time.time()
 
     def to_close_pokeball(self):
@@ -128,8 +244,6 @@ class Planet(SpaceObject):
         time_to_open = 1
         if self.mass > 0 and self.__time_open and (time.time() - self.__time_open) > time_to_open:
             self.image = service.open_planet_img
-            self.image.set_colorkey(service.colors["BLACK"])
-
             self.__time_open = None
 
     def update(self, *args):
@@ -145,26 +259,29 @@ class Asteroid(SpaceObject):
     Сlass for visible game objects with own size, gravitation and color. It moves under the influence of planets
     and other asteroids gravitation. If asteroid collide with whatever planet it disappears.
     """
+    __slots__ = ('color_name', 'color', 'end_of_line', 'orbit_steps')
 
     def __init__(self, x: int, y: int, mass=10):
         self.color_name, self.color = service.random_color()
         super().__init__(x, y, mass, service.asteroid_image(self.color_name))
         self.end_of_line = 0
-        self.__pos_count_angle = self.rect.center
-        self.__nearest_planet = self.nearest_planet()
-        self.__upper_left_point = list(self.rect.center)
-        self.__lower_right_point = list(self.rect.center)
+        self.orbit_steps = None  # steps asteroid is on closed orbit of every planet (see ask_satellites)
+
+    def reset(self, x: int, y: int, mass=10):
+        """Method make used asteroid as good as new one (it is called by asteroid_pool)."""
+        self.color_name, self.color = service.random_color()
+        self.place(x, y, mass, service.asteroid_image(self.color_name))
+        self.end_of_line = 0
+        self.orbit_steps = None
+
+    def kill(self):
+        """Method remove asteroid from all groups and give it back to its pool."""
+        super().kill()
+        release_sprite(self)
 
     def update(self):
-        """Method of changing object coordinates. If object coordinates are out of screen,
-        method remove this object."""
+        """Method remove object, if its coordinates are out of screen (objects are moved by move_asteroids)."""
         self.__to_kill()
-        dt = 1 / 9
-        self.vx += self.ax
-        self.vy += self.ay
-
-        self.rect.x += self.vx * dt
-        self.rect.y += self.vy * dt
 
     def starting_direction(self, end_of_line):
         """
@@ -175,48 +292,6 @@ class Asteroid(SpaceObject):
         self.vx = (self.rect.x - end_of_line[0]) * dt
         self.vy = (self.rect.y - end_of_line[1]) * dt
 
-    def nearest_planet(self) -> Planet:
-        """Method returns nearest to asteroid planet."""
-        all_planets = list(service.all_planet)
-        distance_to_planets = [
-            (planet, math.sqrt((self.rect.x - planet.rect.x) ** 2 + (self.rect.y - planet.rect.y)
-                               ** 2)) for planet in all_planets]  # [(planet, distance_to_it), ...]
-        distance_to_planets.sort(reverse=False, key=lambda x: x[1])
-        return distance_to_planets[0][0]
-
-    def __find_extreme_points(self):
-        """Method searching whether asteroid pos is most upper-left or lower-right."""
-        if self.rect.x < self.__upper_left_point[0]:
-            self.__upper_left_point[0] = self.rect.x
-        if self.rect.x > self.__lower_right_point[0]:
-            self.__lower_right_point[0] = self.rect.x
-        if self.rect.y < self.__upper_left_point[1]:
-            self.__upper_left_point[1] = self.rect.y
-        if self.rect.y > self.__lower_right_point[1]:
-            self.__lower_right_point[1] = self.rect.y
-
-    def is_satellite_of(self) -> list:
-        """
-        Method check whether asteroid is a satellite of any planet.
-        Return list of planets(whose satellite asteroid is).
-        """
-        list_of_planets = []
-        cos = find_cos_angle(*self.__pos_count_angle, *self.__nearest_planet.rect.center,
-                             *self.rect.center)
-        self.__find_extreme_points()
-        # some debug code
-
-        # pygame.draw.circle(service.screen, service.colors["LIGHT_BLUE"], self.__lower_right_point, 4, 4)
-        # pygame.draw.circle(service.screen, service.colors["PURPLE"], self.__upper_left_point, 4, 4)
-
-        if cos < -0.999:
-            list_of_planets = planets_in_rectangle(created_rect(self.__lower_right_point, self.__upper_left_point))
-            # some debug code
-
-            # pygame.draw.rect(service.screen, service.colors["LIGHT_BLUE"],
-            # created_rect(self.__lower_right_point, self.__upper_left_point))
-        return list_of_planets
-
     def __to_kill(self):
         """Method check whether object is out of screen. If it`s so it remove it."""
         if self.rect.x < 0 or self.rect.x > service.WIN_WIDTH:
@@ -224,13 +299,23 @@ class Asteroid(SpaceObject):
         if 0 > self.rect.y or self.rect.y > service.WIN_HEIGHT:
             self.kill()
 
-    def draw_trajectory(self, end_of_line):
-        """Method draw trajectory of asteroid movement."""
-        AsteroidTrajectory(self, end_of_line).to_draw_traectory()
+    def draw_trajectory(self, end_of_line, renderer=None):
+        """
+        Method draw trajectory of asteroid movement on service.screen or with given render.DirtyRenderer.
+        Trajectory is taken from trajectory_cache, so it is simulated only if something has changed.
+        """
+        if isinstance(self, Prop):
+            return
+        points = trajectory_cache.points(self, end_of_line)
+        if renderer is None:
+            pygame.draw.aalines(service.screen, self.color, False, points)
+        else:
+            renderer.aalines(self.color, False, points)
 
 
 class AsteroidTrajectory(SpaceObject):
     """Class that help assteroid to draw trajectory of its movement."""
+    __slots__ = ('color', 'is_props')
 
     def __init__(self, asteroid_copy: Asteroid, end_of_line):
         super().__init__(*asteroid_copy.rect.center, asteroid_copy.mass, asteroid_copy.image)
@@ -238,17 +323,38 @@ class AsteroidTrajectory(SpaceObject):
         self.starting_direction(end_of_line)
         self.is_props = isinstance(asteroid_copy, Prop)
 
+    def reset(self, asteroid_copy: Asteroid, end_of_line):
+        """Method make used trajectory point as good as new one (it is called by trajectory_pool)."""
+        self.place(*asteroid_copy.rect.center, asteroid_copy.mass, asteroid_copy.image)
+        self.color = asteroid_copy.color
+        self.starting_direction(end_of_line)
+        self.is_props = isinstance(asteroid_copy, Prop)
+
     def if_to_kill(self):
         """Method check whether trajectory if out of screen."""
         res = 0
-        if self.rect.x < 0 or self.rect.x > service.WIN_WIDTH:
-            res = 1
-        if 0 > self.rect.y or self.rect.y > service.WIN_HEIGHT:
-            res = 1
-        if pygame.sprite.spritecollide(self, service.all_planet, dokill=False):
+        if self.end_reason():
             res = 1
         return res
 
+    def end_reason(self):
+        """Method returns why trajectory ends here: 'edge', 'planet' or None (if it goes on)."""
+        if is_out_of_window(self.rect.x, self.rect.y, service.WIN_WIDTH, service.WIN_HEIGHT):
+            return 'edge'
+        if service.collision_grid.query(self.rect, service.all_planet):
+            return 'planet'
+        return None
+
+    @property
+    def state(self):
+        """Returns position and velocity of trajectory point, state can be restored later."""
+        return (*self.world.positions[self.body].tolist(), *self.world.velocities[self.body].tolist())
+
+    @state.setter
+    def state(self, state):
+        self.world.set_position(self.body, *state[:2])
+        self.world.velocities[self.body] = state[2:]
+
     def starting_direction(self, end_of_line):
         """
         Method set line segment(that are moving from parameter: end_of_line to asteroid spot)
@@ -259,13 +365,26 @@ class AsteroidTrajectory(SpaceObject):
         self.vy = (self.rect.y - end_of_line[1]) * dt
 
     def update(self):
-        """Method move trajectory point."""
-        dt = 1 / 9
-        self.vx += self.ax
-        self.vy += self.ay
+        """Method move trajectory point by one physics step."""
+        self.world.step([obj.body for obj in service.all_objects], [self.body])
 
-        self.rect.x += self.vx * dt
-        self.rect.y += self.vy * dt
+    def simulate(self, coordinate_list, states):
+        """
+        Method move trajectory point until it leaves screen, collides with planet or
+        coordinate_list reach TRAJECTORY_LENGTH. Points are appended to coordinate_list,
+        state of point before each of them is appended to states.
+        Returns reason of the end ('edge', 'planet' or 'limit').
+        """
+        service.all_objects.add(self)
+        handles = [obj.body for obj in service.all_objects]
+        reason = self.end_reason()
+        while not reason and len(coordinate_list) < TRAJECTORY_LENGTH:
+            states.append(self.state)
+            coordinate_list.append(self.rect.center)
+            self.world.step(handles, [self.body])
+            reason = self.end_reason()
+        service.all_objects.remove(self)  # point keeps its body, trajectory can be continued later
+        return reason or 'limit'
 
     def to_draw_traectory(self):
         """Method draw trajectory of asteroid movement"""
@@ -274,119 +393,352 @@ class AsteroidTrajectory(SpaceObject):
         else:
             coordinate_list = [(self.rect.x + 18, self.rect.y + 18),
                                (self.rect.x + 19, self.rect.y + 19)]  # to prevent crashes
-            service.all_objects.add(self)
-            while not self.if_to_kill() and len(coordinate_list) < 200:
-                coordinate_list.append(self.rect.center)
-                move_with_gravity(service.all_objects)
-                self.update()
+            self.simulate(coordinate_list, [])
             pygame.draw.aalines(service.screen, self.color, False, coordinate_list)
         self.kill()
 
 
+class TrajectoryEntry:
+    """
+    Cached trajectory preview: points, state of trajectory point before each of them and state after the last one.
+    Segments are (first step, positions, masses) of moving objects, that steps from first step were simulated with.
+    """
+    __slots__ = ('coordinate_list', 'states', 'end_state', 'reason', 'window', 'segments')
+
+    def __init__(self, coordinate_list, window):
+        self.coordinate_list = coordinate_list
+        self.states = []
+        self.end_state = None
+        self.reason = None
+        self.window = window
+        self.segments = []
+
+
+class TrajectoryCache:
+    """
+    Cache of trajectory previews. Key is launch point, aim point and static state of scene
+    (planets and solver settings). Moving objects are not a part of key: they are saved with trajectory
+    and when they move, trajectory is simulated again only from the first step, that drifts more than MAX_DRIFT.
+    Window size is not a part of key: after resize cached trajectory is cut or continued from its last point.
+    """
+    MAX_DRIFT = 0.5  # in pixels, estimated error of cached point: points are drawn rounded to whole pixels
+    MAX_SEGMENTS = 8  # trajectory with more parts simulated at different times is simulated again from start
+
+    def __init__(self, max_size=8):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.resimulations = 0
+        self.__entries = OrderedDict()
+
+    @staticmethod
+    def scene_state():
+        """Returns hashable state of static part of scene (planets and solver settings), that affects trajectories."""
+        world = service.world
+        return (world.solver, world.theta, world.substeps, world.k,
+                tuple((obj.rect.x, obj.rect.y, obj.mass) for obj in service.all_objects if world.static[obj.body]))
+
+    @staticmethod
+    def moving_objects():
+        """Returns positions and masses of moving objects of scene (copies of world rows)."""
+        world = service.world
+        handles = [obj.body for obj in service.all_objects if not world.static[obj.body]]
+        return world.positions[handles], world.masses[handles]
+
+    def clear(self):
+        """Method remove all cached trajectories."""
+        self.__entries.clear()
+
+    def points(self, asteroid: Asteroid, end_of_line):
+        """Method returns points of asteroid trajectory (par: asteroid launched to end_of_line)."""
+        key = (asteroid.rect.center, tuple(end_of_line), asteroid.mass, self.scene_state())
+        window = (service.WIN_WIDTH, service.WIN_HEIGHT)
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = TrajectoryEntry([(asteroid.rect.x + 18, asteroid.rect.y + 18),
+                                     (asteroid.rect.x + 19, asteroid.rect.y + 19)], window)  # to prevent crashes
+            self.__simulate(entry, asteroid, end_of_line, 0)
+            self.__entries[key] = entry
+            if len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self.__entries.move_to_end(key)
+            step = self.__first_invalid(entry)
+            if step is not None:
+                self.resimulations += 1
+                self.__simulate(entry, asteroid, end_of_line, 0 if len(entry.segments) >= self.MAX_SEGMENTS else step)
+            if entry.window != window:
+                self.__fit_to_window(entry, asteroid, end_of_line, window)
+        return entry.coordinate_list
+
+    def __first_invalid(self, entry):
+        """
+        Method returns first step of cached trajectory, that has to be simulated again, because moving objects
+        have moved since it was simulated (or None, if whole trajectory is still good).
+        Error of points is followed in first order: change of acceleration caused by moving objects
+        and growth of error in gravity gradient of scene (close passes by planets enlarge it).
+        """
+        world = service.world
+        positions, masses = self.moving_objects()
+        handles = [obj.body for obj in service.all_objects]
+        states = np.asarray(entry.states + [entry.end_state], dtype=np.float64).reshape(-1, 4)[:, :2]
+        bound = self.__change_bound(entry, states, positions, masses)
+        if not bound:
+            return None  # moving objects have not moved
+        tidal = gravity.tidal_at(states[:-1], world.positions[handles], world.masses[handles], world.k)
+        # error grows at most as b / g * (cosh(n * sqrt(g * VELOCITY_SCALE)) - 1) in gravity gradient of norm g
+        growth = max(float(np.abs(tidal).sum(axis=2).max(initial=0)), 1e-9)
+        exponent = min(len(states) * math.sqrt(growth * physics.VELOCITY_SCALE), 700)
+        if bound / growth * (math.cosh(exponent) - 1) <= self.MAX_DRIFT:
+            return None  # moving objects are too far to move any point by MAX_DRIFT
+        bounds = [segment[0] for segment in entry.segments[1:]] + [len(states) - 1]
+        change = np.zeros_like(states[:-1])
+        for (start, old_positions, old_masses), end in zip(entry.segments, bounds):
+            if not (np.array_equal(positions, old_positions) and np.array_equal(masses, old_masses)):
+                change[start:end] = (gravity.field_at(states[start:end], positions, masses, world.k)
+                                     - gravity.field_at(states[start:end], old_positions, old_masses, world.k))
+        tidal = tidal.tolist()
+        errors = self.__propagate((0.0, 0.0, 0.0, 0.0), tidal, change.tolist())
+        if len(errors) == len(tidal) + 1:
+            return None
+        # trajectory is simulated again from a good point, but error of that point still grows in the rest of it:
+        # the last point, whose error does not grow over MAX_DRIFT till the end, is searched for
+        good, bad = 0, len(errors) - 1
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            if len(self.__propagate(errors[middle], tidal[middle:])) == len(tidal) - middle + 1:
+                good = middle
+            else:
+                bad = middle
+        return good
+
+    def __propagate(self, error, tidal, change=None):
+        """
+        Method follow error of trajectory point (par: error, (ex, ey, evx, evy)) through steps with given
+        gravity gradients (par: tidal) and changes of acceleration (par: change, default: none).
+        Returns errors before every step and after the last one, it stops at error over MAX_DRIFT (it is not given).
+        """
+        ex, ey, vx, vy = error
+        limit = self.MAX_DRIFT ** 2
+        errors = [error]
+        for step, ((txx, txy), (tyx, tyy)) in enumerate(tidal):
+            ax, ay = (0.0, 0.0) if change is None else change[step]
+            vx += txx * ex + txy * ey + ax
+            vy += tyx * ex + tyy * ey + ay
+            ex += physics.VELOCITY_SCALE * vx
+            ey += physics.VELOCITY_SCALE * vy
+            if ex * ex + ey * ey > limit:
+                break
+            errors.append((ex, ey, vx, vy))
+        return errors
+
+    @staticmethod
+    def __change_bound(entry, states, positions, masses) -> float:
+        """
+        Method returns upper bound of change of acceleration in cached points (par: states), that moving objects
+        (par: positions, masses) cause by moving since they were saved: body of mass m moved by d changes
+        acceleration at distance over r by at most 2 * k * m * d / r ** 3 (it is inf, if objects were added or removed).
+        """
+        low, high = states.min(axis=0), states.max(axis=0)
+        bound = 0.0
+        for _, old_positions, old_masses in entry.segments:
+            if old_positions.shape != positions.shape or not np.array_equal(masses, old_masses):
+                return math.inf
+            moved = np.hypot(*(positions - old_positions).T)
+            gap = np.hypot(*np.maximum(np.maximum(low - old_positions, old_positions - high), 0).T) - moved
+            bound = max(bound, float(np.sum(2 * service.world.k * masses * moved / np.maximum(gap, 1) ** 3)))
+        return bound
+
+    def __simulate(self, entry, asteroid, end_of_line, step):
+        """
+        Method simulate trajectory again from given step (par: step) with current moving objects.
+        Trajectory point is taken from trajectory_pool only for the time of simulation.
+        """
+        trajectory = trajectory_pool.acquire(asteroid, end_of_line)
+        if step < len(entry.states):
+            trajectory.state = entry.states[step]
+            del entry.coordinate_list[step + 2:], entry.states[step:]
+        elif entry.end_state is not None:
+            trajectory.state = entry.end_state
+        entry.segments = [segment for segment in entry.segments if segment[0] < step]
+        entry.segments.append((step, *self.moving_objects()))
+        entry.reason = trajectory.simulate(entry.coordinate_list, entry.states)
+        entry.end_state = trajectory.state
+        trajectory.kill()
+        trajectory_pool.release(trajectory)
+
+    @staticmethod
+    def __is_out(state, window):
+        """Method check whether trajectory point is out of window (position is rounded as rect does)."""
+        return is_out_of_window(physics.snap_number(state[0]), physics.snap_number(state[1]), *window)
+
+    def __fit_to_window(self, entry, asteroid, end_of_line, window):
+        """
+        Method cut cached trajectory, if its tail is out of new window,
+        or continue it, if it ended at edge of previous window.
+        """
+        for i, state in enumerate(entry.states):
+            if self.__is_out(state, window):
+                entry.end_state = state
+                del entry.coordinate_list[i + 2:], entry.states[i:]
+                entry.segments = [segment for segment in entry.segments if segment[0] < i] or entry.segments[:1]
+                entry.reason = 'edge'
+                break
+        entry.window = window
+        if entry.reason == 'edge' and not self.__is_out(entry.end_state, window):
+            self.extensions += 1
+            # last step was done with gravity field of previous window, so it is done again
+            self.__simulate(entry, asteroid, end_of_line, max(len(entry.states) - 1, 0))
+
+
 class Prop(Asteroid):
     """Almost invisible game object, that imitate asteroid implementation."""
+    __slots__ = ()
 
     def __init__(self, x, y):
         Asteroid.__init__(self, x, y)
         self.color = (255, 255, 255)
         self.image = service.prop_img
-        self.rect = self.image.get_rect()
-        self.rect.center = (x, y)
+        self.rect = self.image.get_rect(center=(x, y))
+
+    def reset(self, x, y):
+        """Method make used prop as good as new one (it is called by prop_pool)."""
+        Asteroid.reset(self, x, y)
+        self.color = (255, 255, 255)
+        self.image = service.prop_img
+        self.rect = self.image.get_rect(center=(x, y))
 
     def update(self):
         """It`s immovable obj. It`ll be killed just after its creation."""
         self.kill()
 
-    def draw(self):
+    def draw(self, surface=None):
         """Method draw objects."""
         pass
 
 
+# sprites, that are created often, are taken from pools (see service.SpritePool)
+asteroid_pool = service.SpritePool(Asteroid)
+prop_pool = service.SpritePool(Prop)
+trajectory_pool = service.SpritePool(AsteroidTrajectory, max_size=16)
+sprite_pools = (asteroid_pool, prop_pool, trajectory_pool)
+
+
+def release_sprite(sprite):
+    """Function give sprite, that is not used any more, back to pool of its class."""
+    for pool in sprite_pools:
+        if type(sprite) is pool.cls:
+            pool.release(sprite)
+
+
+def is_out_of_window(x, y, width, height):
+    """Function check whether point (par: x, y) is out of window with given size."""
+    return x < 0 or x > width or 0 > y or y > height
+
+
+trajectory_cache = TrajectoryCache()
+
+
 def ask_satellites(asteroids: pygame.sprite.Group):
     """
     Function check whether asteroids are moving around of planets,
     if it`s so, add asteroid as a satellite of appropriate planet.
+    Orbits of all asteroids around all planets are calculated in one pass (see physics.orbital_elements).
+    Asteroid is a satellite of planet, if for ORBIT_STEPS steps its orbit is closed,
+    does not touch planet and does not leave window.
     """
-    for asteroid in asteroids:
-        planets = asteroid.is_satellite_of()
-        for planet in planets:
-            planet.add_satellite(asteroid)
+    asteroids = [asteroid for asteroid in asteroids if not isinstance(asteroid, Prop)]
+    planets = [planet for planet in service.all_planet if planet.mass > 0]  # repelling planets have no orbits
+    if not asteroids or not planets:
+        return
+    world = service.world
+    bodies = [asteroid.body for asteroid in asteroids]
+    centres = [planet.body for planet in planets]
+    energy, _, periapsis, _, box = physics.orbital_elements(world.positions[bodies], world.velocities[bodies],
+                                                            world.positions[centres], world.masses[centres], world.k)
+
+    # asteroid surely misses planet, if it is farther than sum of half diagonals of their rects
+    asteroid_radius = np.array([math.hypot(*asteroid.rect.size) / 2 for asteroid in asteroids])
+    planet_radius = np.array([math.hypot(*planet.rect.size) / 2 for planet in planets])
+    closed = ((energy < 0) & (periapsis > asteroid_radius[:, np.newaxis] + planet_radius) &
+              (box[..., 0] >= 0) & (box[..., 1] >= 0) &
+              (box[..., 2] <= service.WIN_WIDTH) & (box[..., 3] <= service.WIN_HEIGHT))
+
+    previous = np.array([asteroid.orbit_steps if asteroid.orbit_steps is not None and
+                         len(asteroid.orbit_steps) == len(planets) else np.zeros(len(planets), dtype=np.int64)
+                         for asteroid in asteroids])
+    steps = np.where(closed, previous + 1, 0)
+    for asteroid, row in zip(asteroids, steps):
+        asteroid.orbit_steps = row
+    for planet, column in zip(planets, (steps >= ORBIT_STEPS).T):
+        if column.any():
+            planet.add_satellites([asteroids[i] for i in np.flatnonzero(column)])
 
 
 def move_with_gravity(asteroids: pygame.sprite.Group):
     """
-    Function takes tuple of planets(asteroids) calculate their gravitational
-    interaction.
+    Function takes group of planets(asteroids) calculate their gravitational
+    interaction. Forces are calculated by service.world in one batched pass
+    with solver chosen for current level (see physics.World.compute_forces).
     """
-    asteroids = tuple(asteroids)
-    for asteroid in asteroids:
-        asteroid.reset_forses()
-    for asteroid_i in asteroids:
-        for asteroid_j in asteroids:
-            # In order for not to do the same action twice
-            if asteroids.index(asteroid_i) < asteroids.index(asteroid_j):
-                asteroid_i.gravitational_force(asteroid_j)
+    handles = [asteroid.body for asteroid in asteroids]
+    if handles:
+        service.world.compute_forces(handles)
 
 
-def is_collide(planet_group: pygame.sprite.Group, asteroid_group: pygame.sprite.Group):
+def move_asteroids(objects: pygame.sprite.Group, asteroids: pygame.sprite.Group):
     """
-    Function check whether asteroid collides with planet. If it is so, it kill asteroid.
-    And replace image of appropriate planet.
+    Function do one physics step: asteroids out of screen are removed, the rest of them (par: asteroids)
+    are moved under gravity of all objects (par: objects) by service.world (see physics.World.step).
     """
-    collided_planets = pygame.sprite.groupcollide(planet_group, asteroid_group, dokilla=False, dokillb=True)
-    for planet in collided_planets.keys():
-        if isinstance(planet, Planet):
-            planet.pokemon_cached()
+    asteroids.update()
+    movers = [asteroid.body for asteroid in asteroids]
+    if movers:
+        service.world.step([obj.body for obj in objects], movers)
+        for asteroid in asteroids:
+            service.collision_grid.update(asteroid)
 
 
-def find_cos_angle(ax, ay, bx, by, cx, cy):
-    """Function returns cos of angle abc."""
-    if ax == cx and ay == cy:
-        cos_angle = 0
-    else:
-        ab = [bx - ax, by - ay]
-        bc = [cx - bx, cy - by]
-        a_b = ab[0] * bc[0] + ab[1] * bc[1]
-        mod_ab = math.sqrt(ab[0] ** 2 + ab[1] ** 2)
-        mod_bc = math.sqrt(bc[0] ** 2 + bc[1] ** 2)
-        cos_angle = a_b / (mod_ab * mod_bc)
-        # some debug code
-
-        # pygame.draw.aaline(service.screen, service.colors["RED"], [ax, ay], [bx, by])
-        # pygame.draw.aaline(service.screen, service.colors["RED"], [bx, by], [cx, cy])
-    return cos_angle
-
-
-def planets_in_rectangle(rect: pygame.Rect):
+def build_static_field():
     """
-    Method return list of planets in given rectangle.
+    Function precompute gravity field of planets of current level for current window size.
+    It must be called after planets are set and after window resize.
     """
-    all_planets = service.all_planet
-    planet_in_rectangle = [planet for planet in all_planets if rect.collidepoint(*planet.rect.center)]
-    return planet_in_rectangle
+    service.world.build_static_field(service.WIN_WIDTH, service.WIN_HEIGHT,
+                                     [planet.body for planet in service.all_planet])
+
+
+def build_collision_grid():
+    """Function put planets of current level in service.collision_grid (asteroids are put by move_asteroids)."""
+    service.collision_grid.clear()
+    for planet in service.all_planet:
+        service.collision_grid.update(planet)
 
 
-def created_rect(p_1: (tuple or list), p_2: (tuple or list)):
+def is_collide(planet_group: pygame.sprite.Group, asteroid_group: pygame.sprite.Group):
     """
-    Function take upper-left and lower-right points(par: p_1, p_2), calculate width, height.
-    Return created Rect(left, top, width, height).
+    Function check whether asteroid collides with planet. If it is so, it kill asteroid.
+    And replace image of appropriate planet.
+    Only asteroids near planet are checked (they are taken from service.collision_grid).
     """
-    width_ = math.fabs(p_1[0] - p_2[0])
-    height_ = math.fabs(p_1[1] - p_2[1])
-    # some debug code
-
-    # rect = pygame.Rect(*p_2, width_, height_)
-    # pygame.draw.rect(service.screen, service.colors["LIGHT_BLUE"], rect)
-    return pygame.Rect(*p_2, width_, height_)
+    for planet in planet_group:
+        collided_asteroids = service.collision_grid.query(planet.rect, asteroid_group)
+        for asteroid in collided_asteroids:
+            asteroid.kill()
+        if collided_asteroids and isinstance(planet, Planet):
+            planet.pokemon_cached()
 
 
-def to_animate_objects(group_of_obj: pygame.sprite.Group):
+def to_animate_objects(group_of_obj: pygame.sprite.Group, surface=None):
     """
-    Method draw animated objects of given group.
-    (par: group_of_obj).
+    Method animate objects of given group (par: group_of_obj, see buttons.Button.animate) and draw
+    visible ones on given surface (service.screen by default) by one blits() call.
     """
-    for obj in group_of_obj:
-        obj.draw()
+    (service.screen if surface is None else surface).blits(
+        [(obj.image, obj.rect) for obj in group_of_obj if obj.animate()], doreturn=False)
 
 
 def close_nessesary_pokeballs():
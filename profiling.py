@@ -0,0 +1,139 @@
+"""Module with frame profiler: time of every phase of a frame, rolling percentiles, on-screen HUD and trace export."""
+import csv
+import json
+import time
+from collections import deque
+import numpy as np
+import pygame
+
+HISTORY = 240  # frames kept for percentiles
+HUD_REFRESH = 10  # HUD is rendered again every HUD_REFRESH frames
+HUD_BARS = 60  # frames shown in frame time histogram
+FRAME_BUDGET = 1 / 60  # frame time, that is drawn as a line on histogram
+
+
+class FrameProfiler:
+    """
+    Profiler of game loop. begin_frame() starts a frame, mark(phase) adds time passed since previous mark
+    to given phase. Last HISTORY frames are kept for percentiles, every frame is kept for trace if trace_path is set.
+    When profiler is disabled, its methods return at once, so it can stay in the loop.
+    """
+
+    def __init__(self, enabled=False, trace_path=None):
+        self.enabled = enabled or bool(trace_path)
+        self.show_hud = False
+        self.trace_path = trace_path  # .json or .csv file, trace of all frames is written there by save()
+        self.frames = 0
+        self.__history = {}  # phase: deque of seconds of last frames ('total' is whole frame)
+        self.__phases = {}  # phase: seconds in current frame
+        self.__counts = {}  # name: number of objects in current frame
+        self.__trace = []
+        self.__frame_start = None
+        self.__last = None
+        self.__hud = None
+        self.__font = None
+
+    def begin_frame(self):
+        """Method finish previous frame (if there was any) and start a new one."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.__frame_start is not None:
+            self.__phases['total'] = now - self.__frame_start
+            for phase, seconds in self.__phases.items():
+                self.__history.setdefault(phase, deque(maxlen=HISTORY)).append(seconds)
+            if self.trace_path:
+                self.__trace.append({'frame': self.frames, **self.__counts,
+                                     **{phase: round(seconds * 1000, 4) for phase, seconds in self.__phases.items()}})
+            self.frames += 1
+        self.__frame_start = self.__last = now
+        self.__phases = {}
+
+    def mark(self, phase):
+        """Method add time passed since previous mark (or start of frame) to given phase of current frame."""
+        if not self.enabled or self.__last is None:
+            return
+        now = time.perf_counter()
+        self.__phases[phase] = self.__phases.get(phase, 0) + now - self.__last
+        self.__last = now
+
+    def count(self, **counts):
+        """Method save numbers of objects (par: counts, e.g. bodies=10) in current frame."""
+        if self.enabled:
+            self.__counts = counts
+
+    def reset(self):
+        """Method forget unfinished frame (time between levels is not a frame)."""
+        self.__frame_start = self.__last = None
+
+    def percentiles(self, phase, qs=(50, 95, 99)) -> list:
+        """Method returns given percentiles (in seconds) of phase over last HISTORY frames."""
+        history = self.__history.get(phase)
+        if not history:
+            return [0.0] * len(qs)
+        return np.percentile(np.fromiter(history, dtype=np.float64), qs).tolist()
+
+    def summary(self) -> dict:
+        """Returns {phase: (p50, p95, p99)} in milliseconds."""
+        return {phase: tuple(round(value * 1000, 3) for value in self.percentiles(phase)) for phase in self.__history}
+
+    def toggle_hud(self):
+        """Method show or hide HUD, profiler is enabled when HUD is shown."""
+        self.show_hud = not self.show_hud
+        self.enabled = self.enabled or self.show_hud
+
+    def hud(self):
+        """Method returns surface with FPS, phase percentiles, frame time histogram and object counts (or None)."""
+        if not self.show_hud:
+            return None
+        if self.__hud is None or self.frames % HUD_REFRESH == 0:
+            self.__hud = self.__render_hud()
+        return self.__hud
+
+    def __render_hud(self):
+        """Method render HUD surface."""
+        if self.__font is None:
+            self.__font = pygame.font.Font(None, 18)
+        p50, p95, _ = self.percentiles('total', (50, 95, 99))
+        lines = [f"FPS {1 / p50 if p50 else 0:5.1f}   frame p50 {p50 * 1000:5.2f} ms  p95 {p95 * 1000:5.2f} ms",
+                 f"{'phase':<11} {'p50':>6} {'p95':>6} {'p99':>6}"]
+        for phase in self.__history:
+            if phase != 'total':
+                p50, p95, p99 = self.percentiles(phase)
+                lines.append(f"{phase:<11} {p50 * 1000:6.2f} {p95 * 1000:6.2f} {p99 * 1000:6.2f} ms")
+        lines.append('  '.join(f"{name} {value}" for name, value in self.__counts.items()))
+
+        line_height = 16
+        bars_height = 40
+        surface = pygame.Surface((300, line_height * len(lines) + bars_height + 12), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            surface.blit(self.__font.render(line, True, (230, 230, 230)), (6, 4 + i * line_height))
+
+        bottom = surface.get_height() - 4
+        scale = bars_height / (2 * FRAME_BUDGET)  # bar of two frame budgets fills the histogram
+        frames = list(self.__history.get('total', ()))[-HUD_BARS:]
+        for i, seconds in enumerate(frames):
+            height = min(int(seconds * scale), bars_height)
+            color = (90, 200, 90) if seconds <= FRAME_BUDGET * 1.05 else (230, 80, 60)
+            pygame.draw.line(surface, color, (6 + i * 4, bottom), (6 + i * 4, bottom - height), 3)
+        budget_y = bottom - int(FRAME_BUDGET * scale)
+        pygame.draw.line(surface, (230, 230, 230), (4, budget_y), (surface.get_width() - 4, budget_y))
+        return surface
+
+    def save(self, path=None):
+        """Method write trace of all frames to given file (default: trace_path), as JSON or CSV by its extension."""
+        path = path or self.trace_path
+        if not path or not self.__trace:
+            return
+        if path.endswith('.json'):
+            with open(path, 'w') as file:
+                json.dump({'summary_ms': self.summary(), 'frames': self.__trace}, file)
+            return
+        columns = []
+        for frame in self.__trace:
+            columns.extend(key for key in frame if key not in columns)
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, columns)
+            writer.writeheader()
+            writer.writerows(self.__trace)
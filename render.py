@@ -0,0 +1,203 @@
+"""
+Module with dirty rectangles renderer: only changed parts of window are repainted and sent to display,
+and with idle scheduler, that slows level loop down while window does not change.
+"""
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+import pygame
+
+MAX_DIRTY_RECTS = 24  # with more changed regions one full update is cheaper
+MAX_DIRTY_AREA = 0.5  # part of window, from which full update is cheaper
+IDLE_AFTER = 10  # frames without changes, after which scene is static
+# events, after which content of window is lost (it was uncovered, restored or shown), so it is painted fully
+REPAINT_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.WINDOWSHOWN)
+
+
+class DirtyRenderer:
+    """
+    Renderer, that is given a list of drawing operations every frame (blit(), blits(), aaline(), aalines(),
+    circle()). Operations are compared with the ones of previous frame: only regions where something appeared,
+    disappeared or moved are painted again (background first, then operations that touch region)
+    and only those regions are sent to display by display.update(rects).
+    Blits, that go one after another (a layer of sprites), are painted by one Surface.blits call.
+    Whole window is painted and flipped on first frame, after resize or if background is changed.
+    """
+
+    def __init__(self):
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.__operations = []  # operations of recorded frame: (signature, rect, function, args, source)
+        self.__previous = []  # operations shown in previous frame
+        self.__state = None  # (background, window size) of previous frame
+        self.__full = True
+
+    def invalidate(self):
+        """
+        Method make next frame be painted and flipped fully (it must be called after window resize
+        and on REPAINT_EVENTS).
+        """
+        self.__full = True
+
+    def blit(self, source, dest, area=None):
+        """Method record blit of surface (par: source) at given place (par: dest, point or rect)."""
+        rect = pygame.Rect(dest[0], dest[1], *(source.get_size() if area is None else pygame.Rect(area).size))
+        self.__operations.append(((id(source), rect.topleft, None if area is None else tuple(area)), rect,
+                                  pygame.Surface.blit, (source, rect.topleft, area), source))
+
+    def blits(self, blit_sequence, doreturn=False):
+        """Method record blits of (source, dest) or (source, dest, area) items (as pygame.Surface.blits do)."""
+        append = self.__operations.append
+        blit = pygame.Surface.blit
+        for item in blit_sequence:
+            if len(item) > 2:
+                self.blit(*item)
+                continue
+            source, dest = item
+            topleft = (dest[0], dest[1])
+            append(((id(source), topleft, None), source.get_rect(topleft=topleft), blit, (source, topleft), source))
+
+    def draw_group(self, group):
+        """Method record drawing of all sprites of group (as pygame.sprite.Group.draw do)."""
+        self.blits([(sprite.image, sprite.rect) for sprite in group.sprites()])
+
+    def aaline(self, color, start, end):
+        """Method record antialiased line."""
+        rect = self.__bounds((start, end), 1)
+        self.__operations.append((('aaline', tuple(color), tuple(start), tuple(end)), rect,
+                                  pygame.draw.aaline, (color, start, end), None))
+
+    def aalines(self, color, closed, points):
+        """Method record antialiased lines through points (nothing is drawn for less than two points)."""
+        if len(points) < 2:
+            return
+        points = tuple(map(tuple, points))
+        self.__operations.append((('aalines', tuple(color), closed, points), self.__bounds(points, 1),
+                                  pygame.draw.aalines, (color, closed, points), None))
+
+    def circle(self, color, center, radius, width=0):
+        """Method record circle."""
+        rect = self.__bounds((center,), radius + 1)
+        self.__operations.append((('circle', tuple(color), tuple(center), radius, width), rect,
+                                  pygame.draw.circle, (color, center, radius, width), None))
+
+    @staticmethod
+    def __bounds(points, margin):
+        """Method returns rectangle round given points with margin (par: margin) on every side."""
+        xs = [point[0] for point in points]
+        ys = [point[1] for point in points]
+        left, top = int(min(xs)) - margin, int(min(ys)) - margin
+        return pygame.Rect(left, top, int(max(xs)) + margin + 2 - left, int(max(ys)) + margin + 2 - top)
+
+    def present(self, screen, background):
+        """
+        Method paint recorded frame over background on screen and send it to display.
+        Returns list of updated rectangles.
+        """
+        operations, self.__operations = self.__operations, []
+        window = screen.get_rect()
+        state = (background, window.size)
+        dirty = None if self.__full or state != self.__state else self.__dirty_rects(operations, window)
+        self.__previous, self.__state, self.__full = operations, state, False
+
+        if dirty is None:
+            screen.blit(background, (0, 0))
+            self.__paint(screen, operations)
+            pygame.display.flip()
+            self.full_frames += 1
+            return [window]
+
+        for rect in dirty:
+            screen.set_clip(rect)
+            screen.blit(background, rect, rect)
+            self.__paint(screen, [operation for operation in operations if operation[1].colliderect(rect)])
+        screen.set_clip(None)
+        if dirty:
+            pygame.display.update(dirty)
+        self.partial_frames += 1
+        return dirty
+
+    @staticmethod
+    def __paint(screen, operations):
+        """Method do operations on screen, blits in a row (layer of sprites) are done by one Surface.blits call."""
+        for function, layer in groupby(operations, key=itemgetter(2)):
+            if function is pygame.Surface.blit:
+                screen.blits([operation[3] for operation in layer], doreturn=False)
+            else:
+                for operation in layer:
+                    function(screen, *operation[3])
+
+    def __dirty_rects(self, operations, window):
+        """
+        Method returns regions changed since previous frame (overlapping regions are merged)
+        or None, if whole window must be updated.
+        """
+        current = Counter(operation[0] for operation in operations)
+        previous = Counter(operation[0] for operation in self.__previous)
+        rects = [operation[1] for operation in self.__previous if previous[operation[0]] > current[operation[0]]]
+        rects += [operation[1] for operation in operations if current[operation[0]] > previous[operation[0]]]
+
+        merged = []
+        for rect in rects:
+            rect = rect.clip(window)
+            if not rect:
+                continue
+            i = 0
+            while i < len(merged):
+                if merged[i].colliderect(rect):
+                    rect = rect.union(merged.pop(i))
+                    i = 0
+                else:
+                    i += 1
+            merged.append(rect)
+        area = sum(rect.w * rect.h for rect in merged)
+        if len(merged) > MAX_DIRTY_RECTS or area > MAX_DIRTY_AREA * window.w * window.h:
+            return None
+        return merged
+
+
+class IdleScheduler:
+    """
+    Scheduler of level loop. Scene is static, if nothing is simulated or dragged, there is no input
+    and window has not changed for IDLE_AFTER frames. Then loop need not run at full frame rate:
+    it waits for input (see replay.LiveInput.read) and draws frame on event or timeout.
+    Any input or change of window returns full frame rate.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.idle_frames = 0  # frames of current level, that were waited for in idle mode
+        self.__unchanged = 0  # frames in a row, that did not change scene
+        self.__quiet = 0  # frames in a row without input, simulation or dragging
+
+    @property
+    def idle(self) -> bool:
+        """Returns whether next frame can wait for input."""
+        return self.enabled and self.__unchanged >= IDLE_AFTER
+
+    @property
+    def quiet(self) -> bool:
+        """
+        Returns whether there was no input, simulation or dragging for IDLE_AFTER frames.
+        Animations, that only decorate scene (see buttons.Pointer), stop then, so scene can become idle.
+        """
+        return self.enabled and self.__quiet >= IDLE_AFTER
+
+    def reset(self):
+        """Method return full frame rate (it is called at start of level)."""
+        self.idle_frames = 0
+        self.__unchanged = 0
+        self.__quiet = 0
+
+    def frame_done(self, active, events, dirty):
+        """
+        Method is called after frame is shown: whether something is simulated or dragged (par: active),
+        events of frame and rectangles updated by DirtyRenderer.present (par: dirty).
+        """
+        if self.idle:
+            self.idle_frames += 1
+        if active or events or dirty:
+            self.__unchanged = 0
+        else:
+            self.__unchanged += 1
+        self.__quiet = 0 if active or events else self.__quiet + 1
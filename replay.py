@@ -0,0 +1,222 @@
+"""
+Module with input sources of level loop: live input of pygame, recorder of sessions and their player.
+Session file is binary: header, then records: level start (its seed), frame input and digest of world state.
+"""
+import atexit
+import hashlib
+import os
+import random
+import struct
+import pygame
+from pygame.locals import *
+import service
+from constants import FPS
+
+MAGIC = b'ORBR'
+VERSION = 2  # 2: digest covers only bodies of service.all_objects
+CHECK_EVERY = 60  # frames between digests of world state in session file
+IDLE_TIMEOUT = 250  # milliseconds, that idle frame waits for input at most
+# events, that level loop uses (others are not saved)
+EVENT_TYPES = (QUIT, VIDEORESIZE, MOUSEBUTTONDOWN, MOUSEBUTTONUP, KEYDOWN)
+
+_HEADER = struct.Struct('<4sB')  # magic, version
+_LEVEL = struct.Struct('<QB')  # seed, length of level name (name follows)
+_FRAME = struct.Struct('<HhhBB')  # milliseconds of frame, mouse x, y, pressed buttons (bits), number of events
+_MOUSE = struct.Struct('<Bhh')  # button, x, y
+_SIZE = struct.Struct('<HH')  # width, height
+_KEY = struct.Struct('<i')  # key
+DIGEST_SIZE = 8
+
+
+class ReplayFinished(Exception):
+    """Exception, that is raised when all frames of session are played."""
+
+
+def state_digest(world, objects=None) -> bytes:
+    """
+    Function returns short digest of positions and velocities of bodies of game objects (par: objects,
+    default: service.all_objects) sorted by handle. Bodies of pooled sprites or sprites, that wait for gc, are skipped.
+    """
+    objects = service.all_objects if objects is None else objects
+    handles = sorted(obj.body for obj in objects)
+    return hashlib.blake2b(world.positions[handles].tobytes() + world.velocities[handles].tobytes(),
+                           digest_size=DIGEST_SIZE).digest()
+
+
+class LiveInput:
+    """Input of real game: every frame waits for clock and reads mouse and event queue of pygame."""
+
+    def __init__(self):
+        self.frames = 0
+
+    def start_level(self, name):
+        """Method is called before level (par: name) is set."""
+
+    def read(self, clock, idle=False):
+        """
+        Method returns (milliseconds since previous frame, mouse position, pressed mouse buttons, events).
+        Idle frame (par: idle, see render.IdleScheduler) waits for input instead of clock.
+        """
+        if idle:
+            events = self.__wait()
+            elapsed = clock.tick()
+        else:
+            elapsed = clock.tick(FPS)
+            events = pygame.event.get()
+        self.frames += 1
+        return elapsed, pygame.mouse.get_pos(), pygame.mouse.get_pressed(), events
+
+    @staticmethod
+    def __wait() -> list:
+        """Method wait IDLE_TIMEOUT for event (mouse motion is skipped) and returns events or empty list."""
+        deadline = pygame.time.get_ticks() + IDLE_TIMEOUT
+        while True:
+            event = pygame.event.wait(max(deadline - pygame.time.get_ticks(), 1))
+            if event.type == NOEVENT:
+                return []
+            if event.type != MOUSEMOTION:
+                return [event] + pygame.event.get()
+
+    def check(self, world):
+        """Method is called when physics of frame is done."""
+
+
+class Recorder(LiveInput):
+    """Live input, that is written to session file (par: path) at the same time."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.__file = None
+
+    def __write(self, data):
+        """Method write data to session file (file is created on first write)."""
+        if self.__file is None:
+            self.__file = open(self.path, 'wb')
+            self.__file.write(_HEADER.pack(MAGIC, VERSION))
+            atexit.register(self.close)
+        self.__file.write(data)
+
+    def start_level(self, name):
+        """Method seed random generator for level and write the seed, so level is played with the same random."""
+        seed = random.SystemRandom().getrandbits(64)
+        service.seed_random(seed)
+        name = name.encode()
+        self.__write(b'L' + _LEVEL.pack(seed, len(name)) + name)
+
+    def read(self, clock, idle=False):
+        """Method returns input of frame as LiveInput do and write it."""
+        elapsed, pos, pressed, events = super().read(clock, idle)
+        events = [event for event in events if event.type in EVENT_TYPES]
+        buttons = sum(1 << i for i, button in enumerate(pressed[:3]) if button)
+        data = [b'F', _FRAME.pack(min(elapsed, 0xFFFF), *pos, buttons, len(events))]
+        for event in events:
+            data.append(bytes((EVENT_TYPES.index(event.type),)))
+            if event.type in (MOUSEBUTTONDOWN, MOUSEBUTTONUP):
+                data.append(_MOUSE.pack(event.button, *event.pos))
+            elif event.type == VIDEORESIZE:
+                data.append(_SIZE.pack(*event.size))
+            elif event.type == KEYDOWN:
+                data.append(_KEY.pack(event.key))
+        self.__write(b''.join(data))
+        return elapsed, pos, pressed, events
+
+    def check(self, world):
+        """Method write digest of world state every CHECK_EVERY frames."""
+        if self.frames % CHECK_EVERY == 0:
+            self.__write(b'C' + state_digest(world))
+
+    def close(self):
+        """Method close session file."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+class Player:
+    """
+    Input, that is read from session file (par: path) of Recorder. Frames are given at once, without waiting
+    for clock. Level is seeded as it was in session; digests of world state are compared with recorded ones.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.__data = file.read()
+        if len(self.__data) < _HEADER.size or _HEADER.unpack_from(self.__data) != (MAGIC, VERSION):
+            raise ValueError(f"{path}: not a session file of version {VERSION}")
+        self.__offset = _HEADER.size
+        self.frames = 0
+        self.checks = 0  # recorded digests, that were compared
+        self.mismatches = []  # frames, where world state differs from recorded one
+        self.truncated = False  # file ends inside a record
+
+    def __need(self, size):
+        """Method raise ReplayFinished (file is truncated), if there are less than size bytes at current offset."""
+        if self.__offset + size > len(self.__data):
+            self.truncated = True
+            raise ReplayFinished
+
+    def __unpack(self, structure):
+        """Method returns values of given structure at current offset and move offset past them."""
+        self.__need(structure.size)
+        values = structure.unpack_from(self.__data, self.__offset)
+        self.__offset += structure.size
+        return values
+
+    def __expect(self, tag):
+        """Method move past record tag (par: tag) or raise ReplayFinished at end of file."""
+        if self.__offset >= len(self.__data):
+            raise ReplayFinished
+        found = self.__data[self.__offset:self.__offset + 1]
+        if found != tag:
+            raise ValueError(f"session file: expected record {tag!r} at byte {self.__offset}, found {found!r}")
+        self.__offset += 1
+
+    def start_level(self, name):
+        """Method seed random generator as it was seeded at start of level in session."""
+        self.__expect(b'L')
+        seed, length = self.__unpack(_LEVEL)
+        self.__need(length)
+        recorded = self.__data[self.__offset:self.__offset + length].decode()
+        self.__offset += length
+        if recorded != name:
+            raise ValueError(f"session file: level {recorded!r} was started, but now it is {name!r}")
+        service.seed_random(seed)
+
+    def read(self, clock, idle=False):
+        """Method returns input of next frame (clock and idle mode are not used)."""
+        self.__expect(b'F')
+        elapsed, x, y, buttons, count = self.__unpack(_FRAME)
+        events = []
+        for _ in range(count):
+            self.__need(1)
+            event_type = EVENT_TYPES[self.__data[self.__offset]]
+            self.__offset += 1
+            if event_type in (MOUSEBUTTONDOWN, MOUSEBUTTONUP):
+                button, ex, ey = self.__unpack(_MOUSE)
+                events.append(pygame.event.Event(event_type, button=button, pos=(ex, ey)))
+            elif event_type == VIDEORESIZE:
+                w, h = self.__unpack(_SIZE)
+                events.append(pygame.event.Event(event_type, size=(w, h), w=w, h=h))
+            elif event_type == KEYDOWN:
+                key, = self.__unpack(_KEY)
+                events.append(pygame.event.Event(event_type, key=key, mod=0))
+            else:
+                events.append(pygame.event.Event(event_type))
+        self.frames += 1
+        return elapsed, (x, y), tuple(bool(buttons & (1 << i)) for i in range(3)), events
+
+    def check(self, world):
+        """Method compare world state with recorded digest (if there is one after this frame)."""
+        if self.__data[self.__offset:self.__offset + 1] == b'C':
+            self.__offset += 1
+            self.__need(DIGEST_SIZE)
+            recorded = self.__data[self.__offset:self.__offset + DIGEST_SIZE]
+            self.__offset += DIGEST_SIZE
+            self.checks += 1
+            if recorded != state_digest(world):
+                self.mismatches.append(self.frames)
+
+
+# input of level loop; with ORBIT_RECORD=file session is recorded there
+source = Recorder(os.environ['ORBIT_RECORD']) if os.environ.get('ORBIT_RECORD') else LiveInput()
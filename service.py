@@ -1,9 +1,28 @@
 """Service part of project"""
 import os
 import random
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
 import pygame
+import audio
+import physics
+import profiling
+import render
+import spatial
 from constants import *
-from PIL import Image
+
+started_at = time.perf_counter()
+music_random = random.Random()  # songs have own generator, so random of game does not depend on timing of music
+startup_profile = os.environ.get('ORBIT_STARTUP_PROFILE') == '1'  # report time to first frame
+pool_stats = os.environ.get('ORBIT_POOL_STATS') == '1'  # report usage of sprite pools after every level
+# time phases of every frame (F3 shows HUD), with ORBIT_TRACE=file.csv or file.json frames are written there
+profiler = profiling.FrameProfiler(os.environ.get('ORBIT_PROFILE') == '1', os.environ.get('ORBIT_TRACE'))
+# static scenes (pause, menu, nothing is moving) are drawn on input only, ORBIT_IDLE=0 keeps full frame rate
+idle_scheduler = render.IdleScheduler(os.environ.get('ORBIT_IDLE') != '0')
+first_frame_shown = False
+asset_load_times = {}  # path of asset: seconds spent to load it
 
 # default windows size
 WIN_WIDTH = 1200
@@ -20,59 +39,332 @@ on_pause = False
 to_interrupt_press = False
 music_on_pause = False
 lvl_number = 12
+world = physics.World()  # bodies of all planets and asteroids (sprites are views of them)
+collision_grid = spatial.SpatialHash()  # rectangles of planets and flying asteroids
 
 pygame.init()
 pygame.mixer.init()
 pygame.mixer.music.set_volume(0.015625)         # set default music volume
 
 
-def resize_img(image):
-    """Function resize an image, the way it fit window size. And save it in tmp file."""
-    image = Image.open(image)
-    new_image = image.resize((WIN_WIDTH, WIN_HEIGHT))
-    new_image.save(os.path.join(img_folder, 'Backgrounds', f'tmp_bg_file.png'))
+class BackgroundCache:
+    """
+    Backgrounds scaled to window size and kept in memory, key is (image_name, width, height).
+    A few last original images are kept too, so new window size does not need disk reading
+    (originals of prewarmed backgrounds are not kept, so they do not push out original of current one).
+    """
+
+    def __init__(self, max_size=12, originals_size=2):
+        self.max_size = max_size
+        self.originals_size = originals_size
+        self.hits = 0
+        self.misses = 0
+        self.__scaled = OrderedDict()
+        self.__originals = OrderedDict()
+
+    def __original(self, image_name, keep=True):
+        """Method returns not scaled background image (it is kept for next window size, if keep is set)."""
+        original = self.__originals.get(image_name)
+        if original is None:
+            original = pygame.image.load(os.path.join(img_folder, 'Backgrounds', f'{image_name}.png')).convert()
+            if keep:
+                self.__originals[image_name] = original
+                if len(self.__originals) > self.originals_size:
+                    self.__originals.popitem(last=False)
+        else:
+            self.__originals.move_to_end(image_name)
+        return original
+
+    def get(self, image_name, width, height, keep_original=True):
+        """Method returns background image (par: image_name) scaled to width x height."""
+        key = (image_name, width, height)
+        surface = self.__scaled.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.__scaled.move_to_end(key)
+            if keep_original and image_name in self.__originals:
+                self.__originals.move_to_end(image_name)  # background in use is the last to leave
+            return surface
+        self.misses += 1
+        start = time.perf_counter()
+        original = self.__original(image_name, keep_original)
+        if original.get_bitsize() >= 24:
+            surface = pygame.transform.smoothscale(original, (width, height))
+        else:
+            surface = pygame.transform.scale(original, (width, height))
+        path = os.path.join(img_folder, 'Backgrounds', f'{image_name}.png')
+        asset_load_times[path] = asset_load_times.get(path, 0) + time.perf_counter() - start
+        self.__scaled[key] = surface
+        if len(self.__scaled) > self.max_size:
+            self.__scaled.popitem(last=False)
+        return surface
+
+    def prewarm(self, image_names, width, height):
+        """Method scale given backgrounds beforehand, so changing level does not wait for them."""
+        for image_name in image_names:
+            self.get(image_name, width, height, keep_original=False)
 
 
 def set_background(image_name):
-    """Function change background image. It returns Background obj with appropriate image."""
-    resize_img(os.path.join(img_folder, 'Backgrounds', f'{image_name}.png'))  # background_2.png
-    background_img = pygame.image.load(os.path.join(img_folder, 'Backgrounds', f'tmp_bg_file.png')).convert()
-    return background_img
+    """Function returns background image (par: image_name) that fit window size."""
+    return background_cache.get(image_name, WIN_WIDTH, WIN_HEIGHT)
+
+
+def prewarm_backgrounds(image_names):
+    """Function scale given backgrounds to window size beforehand."""
+    background_cache.prewarm(image_names, WIN_WIDTH, WIN_HEIGHT)
 
 
 def delete_all_sprites():
     """It clean all planets and asteroids from level environment."""
+    for sprite in all_objects.sprites() + unavailable_asteroids.sprites():
+        sprite.kill()  # pooled sprites go back to their pools
+    unavailable_asteroids.empty()
     lvl_environment = [all_objects, all_planet, available_asteroids, all_buttons, all_lives_sprites, lvl_counters]
     for group in lvl_environment:
         group.empty()
+    world.clear()  # bodies of sprites, that were dropped without kill(), are removed too
+    collision_grid.clear()
+
+
+class SpritePool:
+    """
+    Pool of sprites of one class (par: cls). Sprite, that is not used any more, is given back by release()
+    and acquire() resets it in place (with cls.reset) instead of creating a new one.
+    """
+
+    def __init__(self, cls, max_size=32):
+        self.cls = cls
+        self.max_size = max_size
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.__free = []
+        self.__free_ids = set()
+
+    def __len__(self):
+        return len(self.__free)
+
+    def acquire(self, *args, **kwargs):
+        """Method returns sprite made with given arguments, a free one is reused if there is any."""
+        while self.__free:
+            sprite = self.__free.pop()
+            self.__free_ids.discard(id(sprite))
+            if sprite.alive():
+                continue  # it was added to a group after release, so somebody uses it again
+            sprite.reset(*args, **kwargs)
+            self.reused += 1
+            return sprite
+        self.created += 1
+        return self.cls(*args, **kwargs)
+
+    def release(self, sprite):
+        """
+        Method give sprite back to pool (sprites of other classes and extra sprites are left to gc).
+        Body of released sprite is given back to world, acquire() takes a new one (in cls.reset).
+        """
+        if type(sprite) is not self.cls:
+            return
+        sprite.free_body()
+        if id(sprite) not in self.__free_ids and len(self.__free) < self.max_size:
+            self.__free.append(sprite)
+            self.__free_ids.add(id(sprite))
+            self.released += 1
+
+    def clear(self):
+        """Method drop all free sprites."""
+        self.__free.clear()
+        self.__free_ids.clear()
+
+    def stats(self) -> str:
+        """Returns line with usage of pool."""
+        return (f"{self.cls.__name__} pool: {len(self.__free)} free of {self.max_size}, "
+                f"created {self.created}, reused {self.reused}, released {self.released}")
+
+
+class SurfaceCache:
+    """
+    LRU cache of images loaded from disk and converted to display format.
+    Counters hits and misses show, whether images are read from disk again.
+    Images can be decoded beforehand on a background thread (see prefetch()).
+    Images with colorkey are RLE accelerated (they are only blitted, never drawn on).
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__surfaces = OrderedDict()
+        self.__decoded = {}  # path: image decoded by prefetch thread, but not converted yet
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__surfaces)
+
+    def get(self, path, colorkey=None, alpha=False):
+        """
+        Method returns image from given path converted to display format (with per pixel alpha if par: alpha)
+        and with given colorkey set. Image is read from disk only if it is not in cache.
+        Returned surface is shared, do not draw on it.
+        """
+        key = (path, colorkey, alpha)
+        surface = self.__surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.__surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        start = time.perf_counter()
+        with self.__lock:
+            surface = self.__decoded.pop(path, None)
+        if surface is None:
+            surface = pygame.image.load(path)
+        surface = surface.convert_alpha() if alpha else surface.convert()
+        asset_load_times[path] = asset_load_times.get(path, 0) + time.perf_counter() - start
+        if colorkey is not None:
+            surface.set_colorkey(colorkey, pygame.RLEACCEL)
+        self.__surfaces[key] = surface
+        if len(self.__surfaces) > self.max_size:
+            self.__surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        """Method remove all images from cache."""
+        self.__surfaces.clear()
+
+    def prefetch(self, paths):
+        """
+        Method decode given images on a background thread, so get() do not read disk later.
+        Conversion to display format is left to get() (it must be done on the main thread).
+        """
+        loaded = {key[0] for key in self.__surfaces}
+        with self.__lock:
+            paths = [path for path in paths if path not in loaded and path not in self.__decoded]
+        if paths:
+            threading.Thread(target=self.__decode, args=(paths,), daemon=True).start()
+
+    def __decode(self, paths):
+        """Method decode images (par: paths), it is run on prefetch thread."""
+        for path in paths:
+            try:
+                surface = pygame.image.load(path)
+            except (pygame.error, OSError):
+                continue  # get() will report it
+            with self.__lock:
+                self.__decoded[path] = surface
+
+
+class LazyImages(Sequence):
+    """
+    List of images, every image is loaded on first use and kept then,
+    so sprites switch between images by reference.
+    """
+
+    def __init__(self, paths, **options):
+        self.__paths = tuple(paths)
+        self.__options = options
+        self.__images = {}  # index: loaded image
+
+    def __len__(self):
+        return len(self.__paths)
 
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        image = self.__images.get(index)
+        if image is None:
+            image = self.__images[index] = load_image(*self.__paths[index], **self.__options)
+        return image
 
+    @property
+    def paths(self):
+        """Returns full paths of images."""
+        return [os.path.join(img_folder, *path) for path in self.__paths]
+
+
+class AssetRegistry:
+    """
+    Images known by name (service.<name>). Every image is loaded on first use,
+    images can be decoded beforehand on background thread with prefetch() and loaded with prepare().
+    Options of loading (par: options, see load_image) are given to every image.
+    """
+
+    def __init__(self, **options):
+        self.__options = options
+        self.__assets = {}
+
+    def __contains__(self, name):
+        return name in self.__assets
+
+    def register(self, name, *path, **options):
+        """Method register image with given name and path (relative to img_folder)."""
+        self.__assets[name] = (LazyImages([path], **{**self.__options, **options}), False)
+
+    def register_list(self, name, paths, **options):
+        """Method register list of images with given name (par: paths is list of paths)."""
+        self.__assets[name] = (LazyImages(paths, **{**self.__options, **options}), True)
+
+    def get(self, name):
+        """Method returns image (or list of images if it was registered as list) with given name."""
+        images, is_list = self.__assets[name]
+        return images if is_list else images[0]
+
+    def prefetch(self, names):
+        """Method decode images with given names on a background thread."""
+        image_cache.prefetch([path for name in names for path in self.__assets[name][0].paths])
+
+    def prepare(self, names):
+        """Method load all images with given names (it must be done on the main thread)."""
+        for name in names:
+            list(self.__assets[name][0])  # images are kept by LazyImages
+
+
+def load_image(*path, colorkey=None, alpha=False):
+    """Function returns image from img_folder (par: path) converted to display format, images are cached."""
+    return image_cache.get(os.path.join(img_folder, *path), colorkey, alpha)
+
+
+image_cache = SurfaceCache()
+background_cache = BackgroundCache()
 game_folder = os.path.dirname(__file__)
 img_folder = os.path.join(game_folder, 'image')
 music_folder = os.path.join(game_folder, 'music')
 
-# loading images
-sound_on_button_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'sound_on_button.png')).convert()
-sound_off_button_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'sound_off_button.png')).convert()
-open_planet_img = pygame.image.load(os.path.join(img_folder, 'Pokeballs', 'open_pokeball.png')).convert()
-close_planet_img = pygame.image.load(os.path.join(img_folder, 'Pokeballs', 'close_pokeball.png')).convert()
-repeling_planet_img = pygame.image.load(os.path.join(img_folder, 'Pokeballs', 'repeling_planet.png')).convert()
-starting_game_button_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'starting_game_button.png')).convert()
-next_lvl_button_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'next_lvl_button.png')).convert()
-help_button_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'help_button.png')).convert()
-back_to_menu_button_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'back_to_menu_button.png')).convert()
-back_to_checkpoint_button_img = pygame.image.load(os.path.join(img_folder, 'Buttons',
-                                                               'back_to_checkpoint_button.png')).convert()
-life_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'pokecoin.png')).convert()
-pointer_img = pygame.image.load(os.path.join(img_folder, 'Messages', 'pointer.png')).convert()
-levels_img = [pygame.image.load(os.path.join(img_folder, 'Levels', f'{i}.png')).convert() for i in range(1, lvl_number)]
-help_pages_img = [pygame.image.load(os.path.join(img_folder, 'Messages', f'{img}.png')).convert() for img in
-                  help_massages]
-prop_img = pygame.image.load(os.path.join(img_folder, 'Pokemons', f'prop.png')).convert()
-checkpoint_img = pygame.image.load(os.path.join(img_folder, 'Messages', 'checkpoint.png')).convert()
-next_page_pointer_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'next_help_page.png')).convert()
-previous_page_pointer_img = pygame.image.load(os.path.join(img_folder, 'Buttons', 'previous_help_page.png')).convert()
-icon_img = pygame.image.load(os.path.join(img_folder, 'Icons', 'crown.png'))
+# registering images, they are loaded on first use of service.<name>; black is transparent on all of them
+assets = AssetRegistry(colorkey=colors["BLACK"])
+assets.register('sound_on_button_img', 'Buttons', 'sound_on_button.png')
+assets.register('sound_off_button_img', 'Buttons', 'sound_off_button.png')
+assets.register('open_planet_img', 'Pokeballs', 'open_pokeball.png')
+assets.register('close_planet_img', 'Pokeballs', 'close_pokeball.png')
+assets.register('repeling_planet_img', 'Pokeballs', 'repeling_planet.png')
+assets.register('starting_game_button_img', 'Buttons', 'starting_game_button.png')
+assets.register('next_lvl_button_img', 'Buttons', 'next_lvl_button.png')
+assets.register('help_button_img', 'Buttons', 'help_button.png')
+assets.register('back_to_menu_button_img', 'Buttons', 'back_to_menu_button.png')
+assets.register('back_to_checkpoint_button_img', 'Buttons', 'back_to_checkpoint_button.png')
+assets.register('life_img', 'Buttons', 'pokecoin.png')
+assets.register('pointer_img', 'Messages', 'pointer.png')
+assets.register_list('levels_img', [('Levels', f'{i}.png') for i in range(1, lvl_number)])
+assets.register_list('help_pages_img', [('Messages', f'{img}.png') for img in help_massages])
+assets.register('prop_img', 'Pokemons', 'prop.png')
+assets.register('checkpoint_img', 'Messages', 'checkpoint.png')
+assets.register('next_page_pointer_img', 'Buttons', 'next_help_page.png')
+assets.register('previous_page_pointer_img', 'Buttons', 'previous_help_page.png')
+level_assets = ('open_planet_img', 'close_planet_img', 'repeling_planet_img', 'levels_img', 'life_img',
+                'next_lvl_button_img', 'help_pages_img', 'back_to_checkpoint_button_img')
+# images, that sprites of level switch to (pokeball is opened and closed, counter shows number of satellites)
+state_assets = ('open_planet_img', 'close_planet_img', 'repeling_planet_img', 'levels_img')
+
+
+def __getattr__(name):
+    """Function load registered image on first use of service.<name>."""
+    if name in assets:
+        value = globals()[name] = assets.get(name)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # lvl environment initialization
 all_planet = pygame.sprite.Group()
@@ -95,12 +387,18 @@ def random_color():
     return color_name, color
 
 
+def seed_random(seed):
+    """Function seed random of game, so colors and images of asteroids are repeated after it."""
+    random.seed(seed)
+    random_color.__colors = []  # colors left from previous ones are forgotten
+
+
 def random_crash_eff():
     """Function give you random song (in range of crash_eff in constants.py)."""
     # using function filed to not to repeat crash effect up to they end
     if not hasattr(random_crash_eff, '__effects') or random_crash_eff.__effects == []:
         random_crash_eff.__effects = list(crash_lib)
-    song_name = random.choice(random_crash_eff.__effects)
+    song_name = music_random.choice(random_crash_eff.__effects)
     random_crash_eff.__effects.remove(song_name)
     return song_name
 
@@ -110,34 +408,59 @@ def random_song():
     # using function filed to not to repeat song up to they end
     if not hasattr(random_song, '__song') or random_song.__song == []:
         random_song.__song = list(music_lib)
-    song_name = random.choice(random_song.__song)
+    song_name = music_random.choice(random_song.__song)
     random_song.__song.remove(song_name)
     return song_name
 
 
+audio_player = audio.AudioPlayer(music_folder, random_song, crash_lib + winning_lib)
+
+
 def play_song(song):
-    """Function start to play given song."""
-    pygame.mixer.music.load(os.path.join(music_folder, f'{song}.wav'))
-    pygame.mixer.music.play()
+    """Function start to play given sound effect (music goes on after it); it does not wait for loading."""
+    audio_player.play_effect(song)
 
 
 def fill_music_queue():
-    """Function fill music queue and start it."""
-    pygame.mixer.music.load(os.path.join(music_folder, f'{random_song()}.wav'))
-    for _ in music_lib:
-        pygame.mixer.music.queue(os.path.join(music_folder, f'{random_song()}.wav'))
-    pygame.mixer_music.play(-1)
+    """Function start music from random songs; it does not wait for loading."""
+    audio_player.play_music()
 
 
 def asteroid_image(color):
     """Function give you a random img of asteroid with appropriate param: color."""
     img_name = random.choice(asteroids_by_color[color])
-    asteroid_img = pygame.image.load(os.path.join(img_folder, 'Pokemons', f'{img_name}.png'))
+    asteroid_img = load_image('Pokemons', f'{img_name}.png', colorkey=colors["BLACK"], alpha=True)
     return asteroid_img
 
 
 def set_window_header():
     """Method set icon and caption of a game window."""
     pygame.display.set_caption("Asteroids")
+    icon_img = pygame.image.load(os.path.join(img_folder, 'Icons', 'crown.png'))
     icon_img.set_colorkey(colors["BLACK"])
     pygame.display.set_icon(icon_img)
+
+
+def prefetch_level_assets():
+    """Function start to decode images, that levels need, on a background thread."""
+    assets.prefetch(level_assets)
+    image_cache.prefetch([os.path.join(img_folder, 'Pokemons', f'{name}.png')
+                          for names in asteroids_by_color.values() for name in names])
+
+
+def prepare_level_assets():
+    """Function load images, that sprites of level switch to, so they are not loaded during frames."""
+    assets.prepare(state_assets)
+
+
+def mark_first_frame():
+    """Function is called when a frame is shown; in startup profile mode first call prints a report."""
+    global first_frame_shown
+    first_frame_shown = True
+    if startup_profile:
+        total = time.perf_counter() - started_at
+        loading = sum(asset_load_times.values())
+        print(f"time to first frame: {total * 1000:.1f} ms ({loading * 1000:.1f} ms of it loading "
+              f"{len(asset_load_times)} assets)")
+        for path, seconds in sorted(asset_load_times.items(), key=lambda item: -item[1]):
+            print(f"{seconds * 1000:8.2f} ms  {os.path.relpath(path, game_folder)}")
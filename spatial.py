@@ -0,0 +1,133 @@
+"""Module with spatial indexes, that find objects near given place without checking all objects."""
+import numpy as np
+import pygame
+
+CELL_SIZE = 64  # side of a spatial hash cell, in pixels (about size of an asteroid or a planet)
+OCCUPANCY_CELL = 10  # side of an occupancy grid cell, in pixels
+OCCUPANCY_PENDING = 32  # regions occupied after summed area table was built, that are checked one by one
+
+
+class SpatialHash:
+    """
+    Uniform grid over the plane. Every object is put in all cells its rectangle touches,
+    so objects colliding with a rectangle are searched only in cells of that rectangle:
+    cost of a query depends on number of objects near it, not on number of all objects.
+    """
+
+    def __init__(self, cell=CELL_SIZE):
+        self.cell = cell
+        self.__cells = {}  # (column, row): {object: None, ...} (dict keeps order of insertion)
+        self.__objects = {}  # object: (rect, cells of object)
+
+    def __len__(self):
+        return len(self.__objects)
+
+    def __contains__(self, obj):
+        return obj in self.__objects
+
+    def __cells_of(self, rect):
+        """Method returns keys of all cells, that rectangle (par: rect) touches."""
+        cell = self.cell
+        left, top = rect.left // cell, rect.top // cell
+        right, bottom = max(rect.right - 1, rect.left) // cell, max(rect.bottom - 1, rect.top) // cell
+        return tuple((col, row) for col in range(left, right + 1) for row in range(top, bottom + 1))
+
+    def update(self, obj, rect=None):
+        """
+        Method put object in grid with given rectangle (default: obj.rect) or move it there,
+        if it is already in grid. Cells are changed only if object has crossed a cell border.
+        """
+        rect = pygame.Rect(obj.rect if rect is None else rect)
+        keys = self.__cells_of(rect)
+        old = self.__objects.get(obj)
+        if old is not None and old[1] == keys:
+            self.__objects[obj] = (rect, keys)
+            return
+        if old is not None:
+            self.remove(obj)
+        for key in keys:
+            self.__cells.setdefault(key, {})[obj] = None
+        self.__objects[obj] = (rect, keys)
+
+    def remove(self, obj):
+        """Method take object out of grid (nothing happens if it is not there)."""
+        old = self.__objects.pop(obj, None)
+        if old is None:
+            return
+        for key in old[1]:
+            cell = self.__cells[key]
+            del cell[obj]
+            if not cell:
+                del self.__cells[key]
+
+    def clear(self):
+        """Method remove all objects."""
+        self.__cells.clear()
+        self.__objects.clear()
+
+    def query(self, rect, group=None) -> list:
+        """
+        Method returns objects, whose rectangles collide with given one (par: rect).
+        If group is given, only its members are returned.
+        """
+        rect = pygame.Rect(rect)
+        found = {}
+        cells = self.__cells
+        for key in self.__cells_of(rect):
+            cell = cells.get(key)
+            if cell:
+                found.update(cell)
+        objects = self.__objects
+        return [obj for obj in found
+                if (group is None or obj in group) and rect.colliderect(objects[obj][0])]
+
+
+class OccupancyGrid:
+    """
+    Raster of occupied regions of window (par: size) with summed area table: whether a rectangle is free
+    is found by four lookups, whatever number of occupied regions is. Regions are rounded out to whole cells;
+    parts of rectangles outside of window are free. Regions occupied after table was built are checked
+    one by one, table is built again when there are more than OCCUPANCY_PENDING of them.
+    """
+
+    def __init__(self, size, cell=OCCUPANCY_CELL):
+        self.cell = cell
+        self.__cells = np.zeros((-(-size[1] // cell), -(-size[0] // cell)), dtype=np.int32)
+        self.__table = None  # summed area table of cells
+        self.__pending = []  # spans of regions, that are not in table yet
+
+    def __span(self, rect):
+        """Method returns (top, bottom, left, right) of cells, that rectangle touches (end is excluded)."""
+        rows, columns = self.__cells.shape
+        cell = self.cell
+        top = min(max(rect.top // cell, 0), rows)
+        bottom = min(max(max(rect.bottom - 1, rect.top) // cell + 1, 0), rows)
+        left = min(max(rect.left // cell, 0), columns)
+        right = min(max(max(rect.right - 1, rect.left) // cell + 1, 0), columns)
+        return top, bottom, left, right
+
+    def occupy(self, rect):
+        """Method mark region of rectangle (par: rect) as occupied."""
+        span = self.__span(pygame.Rect(rect))
+        top, bottom, left, right = span
+        self.__cells[top:bottom, left:right] = 1
+        if self.__table is not None:
+            self.__pending.append(span)
+            if len(self.__pending) > OCCUPANCY_PENDING:
+                self.__table = None
+
+    def is_free(self, rect) -> bool:
+        """Method returns whether rectangle (par: rect) does not touch occupied regions."""
+        if self.__table is None:
+            rows, columns = self.__cells.shape
+            self.__table = np.zeros((rows + 1, columns + 1), dtype=np.int32)
+            self.__table[1:, 1:] = self.__cells.cumsum(0).cumsum(1)
+            self.__pending = []
+        top, bottom, left, right = self.__span(pygame.Rect(rect))
+        if top == bottom or left == right:
+            return True
+        for other_top, other_bottom, other_left, other_right in self.__pending:
+            if top < other_bottom and other_top < bottom and left < other_right and other_left < right:
+                return False
+        table = self.__table
+        return table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left] == 0